@@ -1,276 +1,94 @@
-from http.server import BaseHTTPRequestHandler
-import json
+import base64
 import os
-import anthropic
-import requests
-from urllib.parse import parse_qs, urlparse
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Imported first so the startup report measures everything after it
+from core.startup import mark_response, timed
+
+with timed('import core.app'):
+    from core.app import Api, route_name
+from core.logs import configure_logging
+from core.metrics import request_seconds
+
+# No background listener thread: the instance is frozen once the response is sent
+configure_logging(queued=False)
 
 SIMPLEHASH_API_KEY = os.getenv('SIMPLEHASH_API_KEY')
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 
-# Default collection settings
-DEFAULT_CHAIN = "mantle"
-DEFAULT_CONTRACT = "0x8ca63b0424c7e609051784f5673a76e78a17abed"
 DEFAULT_COLLECTION_NAME = "Petra Boys"
 
 SUPPORTED_CHAINS = ["mantle"]  # Simplified to just support Mantle for now
 
-# Initialize Claude client
-claude = anthropic.Client(api_key=os.getenv('ANTHROPIC_API_KEY'))
+# Warm serverless instances keep the caches and clients between invocations.
+# Nothing heavy is built here: anthropic, requests and the personality
+# snapshot are loaded by the first request that needs them. Bodies are
+# returned as text, so compression is left to Vercel's edge.
+api = Api(
+    SIMPLEHASH_API_KEY,
+    supported_chains=SUPPORTED_CHAINS,
+    default_collection_name=DEFAULT_COLLECTION_NAME,
+    compress_responses=False,
+    # Instances may be frozen as soon as the response is sent
+    prefetch=False
+)
+
+def client_ip(headers):
+    # Vercel's edge sets both; the first X-Forwarded-For hop is the original caller
+    forwarded = headers.get('x-forwarded-for', '').split(',')[0].strip()
+    return forwarded or headers.get('x-real-ip')
 
-def fetch_collection_metadata(chain=DEFAULT_CHAIN, contract_address=DEFAULT_CONTRACT):
-    if not SIMPLEHASH_API_KEY:
-        raise Exception("SIMPLEHASH_API_KEY not configured")
-        
-    url = f"https://api.simplehash.com/api/v0/nfts/{chain}/{contract_address}"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": SIMPLEHASH_API_KEY
-    }
-    params = {
-        "limit": 12,
-        "order_by": "token_id"
-    }
-
-    try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()  # Raise exception for bad status codes
-        
-        data = response.json()
-        if not data.get('nfts'):
-            raise Exception("No NFTs found in collection")
-            
-        collection_data = data['nfts'][0].get('collection', {})
+def handle_request(request):
+    path = request.get('path', '')
+    if not path.startswith('/api/'):
         return {
-            'collection_id': collection_data.get('collection_id'),
-            'name': collection_data.get('name', DEFAULT_COLLECTION_NAME),
-            'description': collection_data.get('description'),
-            'image_url': collection_data.get('image_url'),
-            'banner_image_url': collection_data.get('banner_image_url'),
-            'external_url': collection_data.get('external_url'),
-            'twitter_username': collection_data.get('twitter_username'),
-            'discord_url': collection_data.get('discord_url'),
-            'floor_prices': collection_data.get('floor_prices', []),
-            'distinct_owner_count': collection_data.get('distinct_owner_count'),
-            'distinct_nft_count': collection_data.get('distinct_nft_count'),
-            'total_quantity': collection_data.get('total_quantity'),
-            'nfts': data['nfts']
+            'statusCode': 404,
+            'body': '{"error": "Not found"}'
         }
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching collection metadata: {e}")
-        raise Exception(f"Failed to fetch collection data: {str(e)}")
-
-def fetch_nft_metadata(chain, contract_address, token_id):
-    url = f"https://api.simplehash.com/api/v0/nfts/{chain}/{contract_address}/{token_id}"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": SIMPLEHASH_API_KEY
-    }
-
-    try:
-        response = requests.get(url, headers=headers)
-        if response.ok:
-            return response.json()
-        return None
-    except Exception as e:
-        print(f"Error fetching NFT metadata: {e}")
-        return None
 
-def generate_personality(nft_data):
-    traits = nft_data.get('extra_metadata', {}).get('attributes', [])
-    trait_map = {t['trait_type']: t['value'] for t in traits}
-    
-    trait_desc = []
-    for trait in traits:
-        if trait['value'] != 'None':
-            trait_desc.append(f"{trait['trait_type']}: {trait['value']}")
-    
-    trait_text = '\n'.join(trait_desc)
-    
-    personality_prompt = f"""You are generating a personality for Boy #{nft_data.get('token_id')} from the Boys collection.
-This NFT has the following specific traits:
-{trait_text}
+    headers = {name.lower(): value for name, value in (request.get('headers') or {}).items()}
+    body = request.get('body') or b''
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    response = api.handle(request.get('method', 'GET'), path, headers, body, client=client_ip(headers))
 
-Create a personality description that EXACTLY matches these traits.
-Rules:
-1. ONLY mention traits that are listed above
-2. Use the EXACT values for each trait (e.g., if Hair Color is 'Blonde', don't say 'golden' or 'yellow')
-3. If a trait is not listed or is 'None', do not mention it at all
-4. Focus on the unique combination of:
-   - Hair Color: {trait_map.get('Hair Color', 'None')}
-   - Face Add-ons: {trait_map.get('Face Add-ons', 'None')}
-   - Eyes: {trait_map.get('Eyes', 'None')}
-   - Clothing: {trait_map.get('Clothing', 'None')}
-   - Tears: {trait_map.get('Tears', 'None')}
-
-The description should be 2-3 sentences long and maintain a warm, artistic tone while being 100% accurate to the traits."""
-
-    try:
-        message = claude.messages.create(
-            model="claude-3-sonnet-20240307",
-            max_tokens=150,
-            temperature=0.7,
-            messages=[{
-                "role": "user",
-                "content": personality_prompt
-            }]
-        )
-        return message.content[0].text
-    except Exception as e:
-        print(f"Error generating personality: {e}")
-        return "A unique character with a gentle soul and artistic spirit."
-
-def handle_request(request):
-    if request.get('path', '').startswith('/api/'):
-        path = request.get('path', '')
-        method = request.get('method', 'GET')
-        query = parse_qs(urlparse(path).query)
-        
-        # Handle /api/chains
-        if path == '/api/chains':
-            return {
-                'statusCode': 200,
-                'body': json.dumps({'chains': SUPPORTED_CHAINS})
-            }
-            
-        # Handle /api/collection
-        if path == '/api/collection':
-            chain = query.get('chain', [None])[0]
-            contract_address = query.get('contract', [None])[0]
-            
-            if not chain or not contract_address:
-                return {
-                    'statusCode': 400,
-                    'body': json.dumps({'error': 'Missing chain or contract address'})
-                }
-                
-            collection_data = fetch_collection_metadata(chain, contract_address)
-            if collection_data:
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps(collection_data)
-                }
-            else:
-                return {
-                    'statusCode': 404,
-                    'body': json.dumps({'error': 'Collection not found'})
-                }
-                
-        # Handle /api/nft/{token_id}
-        if path.startswith('/api/nft/'):
-            token_id = path.split('/')[-1]
-            chain = query.get('chain', [None])[0]
-            contract_address = query.get('contract', [None])[0]
-            
-            if not chain or not contract_address:
-                return {
-                    'statusCode': 400,
-                    'body': json.dumps({'error': 'Missing chain or contract address'})
-                }
-                
-            nft_data = fetch_nft_metadata(chain, contract_address, token_id)
-            if nft_data:
-                personality = generate_personality(nft_data)
-                nft_data['generated_personality'] = personality
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps(nft_data)
-                }
-            else:
-                return {
-                    'statusCode': 404,
-                    'body': json.dumps({'error': 'NFT not found'})
-                }
-                
-        # Handle /api/chat
-        if path == '/api/chat' and method == 'POST':
-            try:
-                body = json.loads(request.get('body', '{}'))
-                user_input = body.get('userInput', '')
-                language = body.get('language', 'en-US')
-                nft_id = body.get('nft_id', '')
-                
-                if not user_input:
-                    return {
-                        'statusCode': 400,
-                        'body': json.dumps({'error': 'Missing user input'})
-                    }
-                    
-                # Get NFT metadata if nft_id is provided
-                nft_context = ""
-                if nft_id:
-                    nft_data = fetch_nft_metadata(nft_id)
-                    if nft_data:
-                        traits = nft_data.get('extra_metadata', {}).get('attributes', [])
-                        trait_map = {t['trait_type']: t['value'] for t in traits}
-                        
-                        personality_traits = []
-                        if trait_map.get('Hair Color'):
-                            personality_traits.append(f"You have {trait_map['Hair Color'].lower()} hair")
-                        if trait_map.get('Eyes') and trait_map['Eyes'] != 'Regular':
-                            personality_traits.append(f"{trait_map['Eyes'].lower()} eyes")
-                        if trait_map.get('Clothing'):
-                            personality_traits.append(f"wearing a {trait_map['Clothing'].lower()}")
-                        if trait_map.get('Face Add-ons') != 'None':
-                            personality_traits.append(f"with {trait_map['Face Add-ons'].lower()}")
-                        if trait_map.get('Tears') == 'Yes':
-                            personality_traits.append("and you're feeling emotional right now")
-                        
-                        traits_desc = ', '.join(personality_traits)
-                        
-                        system_prompt = f"""You are Boy #{nft_id}, a gentle and artistic soul who loves connecting with people. {traits_desc}.
-You have a warm, friendly personality and enjoy thoughtful conversations about art, emotions, and life.
-Keep your responses natural and conversational, as if chatting with a friend.
-Avoid mentioning that you're an NFT or part of a collection - just be yourself.
-When speaking, keep responses concise (2-3 sentences) and maintain a warm, genuine tone."""
-
-                # Prepare the message for Claude
-                if language == 'es-ES':
-                    system_prompt += "\nPlease respond in Spanish, maintaining the same warm and natural tone."
-                
-                # Get response from Claude
-                message = claude.messages.create(
-                    model="claude-3-sonnet-20240307",
-                    max_tokens=150,
-                    temperature=0.7,
-                    system=system_prompt,
-                    messages=[{
-                        "role": "user",
-                        "content": user_input
-                    }]
-                )
-
-                response_text = message.content[0].text
-                
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps({'response': response_text})
-                }
-                
-            except Exception as e:
-                return {
-                    'statusCode': 500,
-                    'body': json.dumps({
-                        'error': str(e),
-                        'type': type(e).__name__
-                    })
-                }
-    
+    # Responses can't be flushed incrementally here, so streamed
+    # responses (chat sentence events) are sent together in one body
+    content = b''.join(response.stream) if response.stream is not None else response.body
+    if response.headers.get('Content-Type', '').startswith('image/'):
+        return {
+            'statusCode': response.status,
+            'headers': response.headers,
+            'body': base64.b64encode(content).decode('ascii'),
+            'isBase64Encoded': True
+        }
     return {
-        'statusCode': 404,
-        'body': json.dumps({'error': 'Not found'})
+        'statusCode': response.status,
+        'headers': response.headers,
+        'body': content.decode('utf-8')
     }
 
 def handler(request, context):
+    started = time.perf_counter()
     response = handle_request(request)
-    
+    request_seconds.observe(
+        time.perf_counter() - started, route_name(request.get('path', '')), request.get('method', 'GET'),
+        response.get('statusCode', 500)
+    )
+    mark_response()
+
     return {
         'statusCode': response.get('statusCode', 500),
         'headers': {
             'Content-Type': 'application/json',
             'Access-Control-Allow-Origin': '*',
             'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-            'Access-Control-Allow-Headers': 'Content-Type'
+            'Access-Control-Allow-Headers': 'Content-Type',
+            **response.get('headers', {})
         },
-        'body': response.get('body', '{"error": "Internal server error"}')
-    } 
\ No newline at end of file
+        'body': response.get('body', '{"error": "Internal server error"}'),
+        'isBase64Encoded': response.get('isBase64Encoded', False)
+    }
@@ -0,0 +1,285 @@
+import argparse
+import http.server
+import json
+import random
+import socketserver
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-ins for the SimpleHash REST API and the Anthropic Messages API,
+# with configurable latency, jitter and error rate, so benchmarks never touch
+# the paid services. Responses are deterministic for a given token. A small
+# in-memory Redis stand-in backs CACHE_BACKEND=redis runs.
+
+HAIR_COLORS = ['Blonde', 'Black', 'Red', 'Brown', 'Blue']
+EYES = ['Regular', 'Closed', 'Wide', 'Sleepy']
+TEARS = ['Yes', 'No']
+BACKGROUNDS = ['Pink', 'Mint', 'Sky', 'Sand', 'Night', 'Peach']
+
+# Published model ids; anything else gets the API's not_found_error, so a typo fails the bench
+KNOWN_MODELS = {
+    'claude-3-haiku-20240307', 'claude-3-sonnet-20240229', 'claude-3-opus-20240229',
+    'claude-3-5-haiku-20241022', 'claude-3-5-sonnet-20240620', 'claude-3-5-sonnet-20241022'
+}
+
+REPLY = ("Hello there, friend! I have the brightest hair in the collection and I love painting. "
+         "What do you like to create when nobody is watching?")
+
+
+class FaultProfile:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def delay(self):
+        with self.lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.error_rate > 0 and self.random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return failed
+
+
+def make_nft(chain, contract, token_id):
+    rnd = random.Random(f"{contract.lower()}:{token_id}")
+    return {
+        'nft_id': f"{chain}.{contract}.{token_id}",
+        'chain': chain,
+        'contract_address': contract,
+        'token_id': str(token_id),
+        'name': f"Boy #{token_id}",
+        'description': "A Boy from the benchmark collection.",
+        'image_url': f"https://cdn.example.com/{contract}/{token_id}.png",
+        'collection': {
+            'collection_id': f"bench-{contract.lower()}",
+            'name': "Benchmark Boys",
+            'description': "Deterministic fake collection",
+            'image_url': f"https://cdn.example.com/{contract}/logo.png",
+            'banner_image_url': f"https://cdn.example.com/{contract}/banner.png",
+            'floor_prices': [{'value': 1.5, 'payment_token': {'symbol': 'MNT'}}],
+            'distinct_owner_count': 420,
+            'distinct_nft_count': FakeSimpleHash.collection_size,
+            'total_quantity': FakeSimpleHash.collection_size
+        },
+        'extra_metadata': {
+            'attributes': [
+                {'trait_type': 'Hair Color', 'value': rnd.choice(HAIR_COLORS)},
+                {'trait_type': 'Eyes', 'value': rnd.choice(EYES)},
+                {'trait_type': 'Tears', 'value': rnd.choice(TEARS)},
+                {'trait_type': 'Background', 'value': rnd.choice(BACKGROUNDS)}
+            ]
+        }
+    }
+
+
+class FakeHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    profile = FaultProfile()
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSimpleHash(FakeHandler):
+    collection_size = 500
+
+    def do_GET(self):
+        if self.profile.delay():
+            self.send_json(503, {'message': "Injected failure"})
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        # .../nfts/assets?nft_ids=chain.contract.id,...
+        if parts[-1] == 'assets':
+            nfts = []
+            for nft_id in query.get('nft_ids', [''])[0].split(','):
+                # Malformed and unknown ids are left out, like SimpleHash does
+                if nft_id.count('.') < 2:
+                    continue
+                chain, contract, token_id = nft_id.split('.', 2)
+                if token_id.isdigit() and int(token_id) < self.collection_size:
+                    nfts.append(make_nft(chain, contract, token_id))
+            self.send_json(200, {'nfts': nfts})
+            return
+        # .../nfts/{chain}/{contract}/{token_id}
+        if len(parts) >= 4 and parts[-4] == 'nfts':
+            chain, contract, token_id = parts[-3:]
+            if not token_id.isdigit() or int(token_id) >= self.collection_size:
+                self.send_json(404, {'message': "Not found"})
+                return
+            self.send_json(200, make_nft(chain, contract, token_id))
+            return
+        # .../nfts/{chain}/{contract}?limit=&cursor=
+        if len(parts) >= 3 and parts[-3] == 'nfts':
+            chain, contract = parts[-2:]
+            start = int(query.get('cursor', ['0'])[0])
+            limit = int(query.get('limit', ['50'])[0])
+            end = min(self.collection_size, start + limit)
+            self.send_json(200, {
+                'nfts': [make_nft(chain, contract, token_id) for token_id in range(start, end)],
+                'next_cursor': str(end) if end < self.collection_size else None
+            })
+            return
+        self.send_json(404, {'message': "Not found"})
+
+
+class FakeAnthropic(FakeHandler):
+    # Delay between streamed text chunks, on top of the profile's time to first token
+    chunk_delay = 0.01
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        if self.profile.delay():
+            self.send_json(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': "Injected failure"}})
+            return
+        model = request.get('model')
+        if model not in KNOWN_MODELS:
+            self.send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': f"model: {model}"}})
+            return
+        if request.get('stream'):
+            self.stream_reply(model)
+            return
+        self.send_json(200, {
+            'id': 'msg_bench', 'type': 'message', 'role': 'assistant', 'model': model,
+            'content': [{'type': 'text', 'text': REPLY}],
+            'stop_reason': 'end_turn', 'stop_sequence': None,
+            'usage': {'input_tokens': 100, 'output_tokens': 30}
+        })
+
+    def stream_reply(self, model):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def event(name, data):
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        event('message_start', {'type': 'message_start', 'message': {
+            'id': 'msg_bench', 'type': 'message', 'role': 'assistant', 'content': [], 'model': model,
+            'stop_reason': None, 'stop_sequence': None, 'usage': {'input_tokens': 100, 'output_tokens': 0}
+        }})
+        event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                      'content_block': {'type': 'text', 'text': ''}})
+        for start in range(0, len(REPLY), 8):
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                          'delta': {'type': 'text_delta', 'text': REPLY[start:start + 8]}})
+        event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+        event('message_delta', {'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                'usage': {'output_tokens': 30}})
+        event('message_stop', {'type': 'message_stop'})
+        self.close_connection = True
+
+
+class FakeRedis(socketserver.StreamRequestHandler):
+    # RESP2 subset used by core.cache_backends.RedisBackend
+    store = {}  # key -> (value, expires_at monotonic or None)
+    lock = threading.Lock()
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            self.wfile.write(self.execute([arg.decode('utf-8') for arg in args[:1]] + args[1:]))
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line.startswith(b'*'):
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def execute(self, args):
+        command = args[0].upper()
+        if command in ('PING', 'AUTH', 'SELECT'):
+            return b'+OK\r\n' if command != 'PING' else b'+PONG\r\n'
+        with self.lock:
+            if command == 'GET':
+                value, expires_at = self.store.get(args[1], (None, None))
+                if value is None or (expires_at is not None and time.monotonic() >= expires_at):
+                    self.store.pop(args[1], None)
+                    return b'$-1\r\n'
+                return b'$%d\r\n%s\r\n' % (len(value), value)
+            if command == 'SET':
+                expires_at = None
+                options = [arg.decode().upper() for arg in args[3:]]
+                if 'PX' in options:
+                    expires_at = time.monotonic() + int(options[options.index('PX') + 1]) / 1000
+                elif 'EX' in options:
+                    expires_at = time.monotonic() + int(options[options.index('EX') + 1])
+                self.store[args[1]] = (args[2], expires_at)
+                return b'+OK\r\n'
+            if command == 'DEL':
+                return b':%d\r\n' % sum(self.store.pop(key, None) is not None for key in args[1:])
+        return b"-ERR unknown command '%s'\r\n" % command.encode()
+
+
+def start_redis(port=0):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', port), FakeRedis)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"redis://127.0.0.1:{server.server_address[1]}/0"
+
+
+def start_server(handler_class, profile, port=0):
+    # A subclass per server so each gets its own fault profile
+    handler = type(handler_class.__name__, (handler_class,), {'profile': profile})
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake SimpleHash and Anthropic servers")
+    parser.add_argument('--simplehash-port', type=int, default=8799)
+    parser.add_argument('--anthropic-port', type=int, default=8798)
+    parser.add_argument('--redis-port', type=int, default=8797)
+    parser.add_argument('--simplehash-latency', type=float, default=0.05)
+    parser.add_argument('--anthropic-latency', type=float, default=0.3, help="seconds to first token")
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--collection-size', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    FakeSimpleHash.collection_size = args.collection_size
+    _, simplehash_url = start_server(
+        FakeSimpleHash, FaultProfile(args.simplehash_latency, args.jitter, args.error_rate, args.seed),
+        args.simplehash_port
+    )
+    _, anthropic_url = start_server(
+        FakeAnthropic, FaultProfile(args.anthropic_latency, args.jitter, args.error_rate, args.seed + 1),
+        args.anthropic_port
+    )
+    _, redis_url = start_redis(args.redis_port)
+    # One line the parent process can parse, then serve until killed
+    print(json.dumps({'simplehash': simplehash_url, 'anthropic': anthropic_url, 'redis': redis_url}), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
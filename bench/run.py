@@ -0,0 +1,307 @@
+import argparse
+import http.client
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Load generator for server.py and api/vercel_handler.handler against the
+# fakes in bench/fake_servers.py. Each scenario runs twice on a fresh process
+# and cache directory: "cold" (every request misses) then "warm" (the same
+# requests again). Results are written as JSON for comparison across commits.
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'bench', 'results')
+SCENARIOS = ('chains', 'collection', 'nft', 'chat')
+CHAIN = 'mantle'
+CONTRACT = '0x8ca63b0424c7e609051784f5673a76e78a17abed'
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    # Nearest-rank
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    errors = sum(1 for status in statuses if status >= 500 or status == 0)
+    to_ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': {str(status): statuses.count(status) for status in sorted(set(statuses))},
+        'duration_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+            'p50': to_ms(percentile(latencies, 0.50)),
+            'p95': to_ms(percentile(latencies, 0.95)),
+            'p99': to_ms(percentile(latencies, 0.99)),
+            'max': to_ms(latencies[-1] if latencies else None)
+        }
+    }
+
+
+def scenario_requests(scenario, count):
+    # Distinct keys per request, so the cold pass misses every time and the
+    # warm pass (same list) hits every time
+    for i in range(count):
+        if scenario == 'chains':
+            yield 'GET', '/api/chains', None
+        elif scenario == 'collection':
+            yield 'GET', f"/api/collection?chain={CHAIN}&contract=0x{i:040x}", None
+        elif scenario == 'nft':
+            yield 'GET', f"/api/nft/{i}?chain={CHAIN}&contract={CONTRACT}", None
+        elif scenario == 'chat':
+            body = {'userInput': "What do you like to paint?", 'nft_id': str(i), 'language': 'en-US'}
+            yield 'POST', '/api/chat', json.dumps(body).encode()
+
+
+class HttpTarget:
+    def __init__(self, base_url):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port
+
+    def send(self, method, path, body):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            headers = {'Accept-Encoding': 'gzip'}
+            if body:
+                headers['Content-Type'] = 'application/json'
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+
+class VercelTarget:
+    # Calls the serverless handler in this process; the fakes run in another one
+    def __init__(self):
+        sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+        import vercel_handler
+        self.handler = vercel_handler.handler
+
+    def send(self, method, path, body):
+        request = {'path': path, 'method': method, 'headers': {}, 'body': body.decode() if body else None}
+        return self.handler(request, None)['statusCode']
+
+
+def run_load(target, requests, concurrency):
+    latencies = []
+    statuses = []
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return
+            started = time.perf_counter()
+            try:
+                status = target.send(*request)
+            except Exception:
+                status = 0
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+def start_fakes(args):
+    command = [
+        sys.executable, '-m', 'bench.fake_servers', '--simplehash-port', '0', '--anthropic-port', '0', '--redis-port', '0',
+        '--simplehash-latency', str(args.simplehash_latency), '--anthropic-latency', str(args.anthropic_latency),
+        '--jitter', str(args.jitter), '--error-rate', str(args.error_rate), '--seed', str(args.seed),
+        '--collection-size', str(max(args.requests, 1))
+    ]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, stdout=subprocess.PIPE, text=True)
+    urls = json.loads(process.stdout.readline())
+    return process, urls
+
+
+def target_env(args, urls, cache_dir):
+    env = dict(os.environ)
+    env.update({
+        'CACHE_DIR': cache_dir,
+        'CACHE_BACKEND': args.cache_backend,
+        'CACHE_REDIS_URL': urls['redis'],
+        # The fake Redis outlives scenarios; a fresh prefix keeps each cold phase cold
+        'CACHE_REDIS_PREFIX': f"bench-{os.path.basename(cache_dir)}:",
+        'SERVER_PROCESSES': str(args.processes),
+        'SIMPLEHASH_BASE_URL': urls['simplehash'],
+        'SIMPLEHASH_API_KEY': 'bench',
+        'ANTHROPIC_BASE_URL': urls['anthropic'],
+        'ANTHROPIC_API_KEY': 'bench',
+        # Keep bundled data, the shipped personality snapshot and the image proxy out of the measurement
+        'BUNDLED_SNAPSHOT_PATH': '',
+        'PERSONALITY_SNAPSHOT_PATH': os.path.join(cache_dir, 'none.json'),
+        'IMAGE_PROXY': '0',
+        # Every bench request comes from 127.0.0.1, so per-client limiting would measure only itself
+        'CLIENT_RATE_LIMIT': '0',
+        'LOG_LEVEL': 'WARNING'
+    })
+    return env
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+        try:
+            connection.request('GET', '/api/chains')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.1)
+        finally:
+            connection.close()
+    raise SystemExit(f"server.py did not start on port {port}")
+
+
+def run_scenario(args, urls, scenario):
+    # A fresh process and cache directory per scenario, so "cold" really is cold
+    with tempfile.TemporaryDirectory(prefix='nft-bench-') as cache_dir:
+        env = target_env(args, urls, cache_dir)
+        server = None
+        if args.target == 'server':
+            env['PORT'] = str(args.port)
+            server = subprocess.Popen([sys.executable, 'server.py'], cwd=ROOT_DIR, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            wait_for_port(args.port)
+            target = HttpTarget(f"http://127.0.0.1:{args.port}")
+        else:
+            # Later flags win, so the child writes to our file whatever --output was given
+            output = os.path.join(cache_dir, 'results.json')
+            command = [sys.executable, '-m', 'bench.run'] + sys.argv[1:] + ['--child-vercel', scenario, '--output', output]
+            subprocess.run(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, check=True)
+            with open(output) as f:
+                return json.load(f)
+        try:
+            return measure(target, scenario, args)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def measure(target, scenario, args):
+    requests = list(scenario_requests(scenario, args.requests))
+    results = []
+    for phase in ('cold', 'warm'):
+        summary = run_load(target, requests, args.concurrency)
+        results.append(dict(summary, scenario=scenario, phase=phase))
+        print(f"{scenario:<11} {phase:<5} {summary['rps']:>8} rps  p50 {summary['latency_ms']['p50']}ms  "
+              f"p95 {summary['latency_ms']['p95']}ms  p99 {summary['latency_ms']['p99']}ms  "
+              f"errors {summary['errors']}", file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(baseline_path, report):
+    with open(baseline_path) as f:
+        baseline = {(r['scenario'], r['phase']): r for r in json.load(f)['results']}
+    print(f"\nvs {baseline_path}", file=sys.stderr)
+    for result in report['results']:
+        before = baseline.get((result['scenario'], result['phase']))
+        if not before:
+            continue
+        deltas = []
+        for key in ('p50', 'p95', 'p99'):
+            old, new = before['latency_ms'][key], result['latency_ms'][key]
+            if old:
+                deltas.append(f"{key} {(new - old) / old * 100:+.0f}%")
+        if before['rps']:
+            deltas.append(f"rps {(result['rps'] - before['rps']) / before['rps'] * 100:+.0f}%")
+        print(f"{result['scenario']:<11} {result['phase']:<5} {'  '.join(deltas)}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against local SimpleHash and Claude fakes")
+    parser.add_argument('--target', choices=('server', 'vercel'), default='server')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument('--requests', type=int, default=200, help="requests per scenario and phase")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--port', type=int, default=8765, help="port for server.py")
+    parser.add_argument('--processes', type=int, default=1, help="server.py worker processes (SERVER_PROCESSES)")
+    parser.add_argument('--cache-backend', choices=('memory', 'sqlite', 'redis'), default='memory')
+    parser.add_argument('--simplehash-latency', type=float, default=0.05)
+    parser.add_argument('--anthropic-latency', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="results file (default bench/results/<time>-<commit>.json)")
+    parser.add_argument('--compare', help="earlier results file to print deltas against")
+    parser.add_argument('--child-vercel', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_vercel:
+        # Runs inside a fresh process whose environment points at the fakes
+        results = measure(VercelTarget(), args.child_vercel, args)
+        with open(args.output, 'w') as f:
+            json.dump(results, f)
+        return
+
+    scenarios = [scenario for scenario in args.scenarios.split(',') if scenario]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    fakes, urls = start_fakes(args)
+    try:
+        results = []
+        for scenario in scenarios:
+            results.extend(run_scenario(args, urls, scenario))
+    finally:
+        fakes.terminate()
+        fakes.wait()
+
+    commit, dirty = git_revision()
+    report = {
+        'commit': commit,
+        'dirty': dirty,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'child_vercel')},
+        'results': results
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'unknown'}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == '__main__':
+    main()
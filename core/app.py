@@ -0,0 +1,600 @@
+import json
+import math
+import threading
+from contextlib import ExitStack
+from urllib.parse import parse_qs, urlparse
+from core.batch import BATCH_MAX_IDS, fetch_nft_batch, parse_token_ids
+from core.caches import collection_cache, collection_key, nft_cache, nft_key
+from core.chat import build_system_prompt, chat_reply, sse_event, stream_chat_sentences, wants_stream
+from core.clients import claude
+from core.concurrency import CHAT_PRIORITY, Overloaded, llm_slots
+from core.deadline import (
+    CHAT_DEADLINE, REQUEST_DEADLINE, DeadlineExceeded, current_deadline, deadline, deadline_expired
+)
+from core.fields import COLLECTION_FIELDS, parse_fields, project
+from core.http_cache import REVALIDATE, EncodedBody, finalize
+from core.images import (
+    ImageError, UnsupportedImage, collection_with_thumbnails, image_proxy, signing_key, with_thumbnails
+)
+from core.logs import DroppingQueueHandler, get_logger
+from core.metrics import registry, span, upstream_errors
+from core.personality import (
+    PERSONALITY_POLISH, personality_flights, polish_stats, prefetch_personality, view_personality
+)
+from core.prefetch import PREFETCH, PREFETCH_PER_VIEW, PREFETCH_RESULTS, grid_after, neighbor_ids, prefetcher
+from core.personality_cache import personality_cache
+from core.ratelimit import client_limiter
+from core.sessions import chat_sessions
+from core.simplehash import SimpleHashClient, collection_info
+from core.snapshot import snapshot_store
+from core.startup import lazy_import, startup_report, timed
+
+# API routes shared by server.py and api/vercel_handler.py. Nothing heavy is
+# imported or constructed here: anthropic, requests and numpy are pulled in by
+# the first request that needs them.
+
+# Collection used when a request doesn't name one
+DEFAULT_CHAIN = "mantle"
+DEFAULT_CONTRACT = "0x8ca63b0424c7e609051784f5673a76e78a17abed"
+
+API_ROUTES = ('/api/chains', '/api/cache/stats', '/api/startup', '/api/metrics', '/api/collection', '/api/nfts',
+              '/api/search', '/api/image', '/api/chat')
+
+# Scrapers poll these, so they don't spend the client's rate limit
+RATE_LIMIT_EXEMPT = ('/api/metrics',)
+
+log = get_logger('app')
+rejected_requests = registry.counter(
+    'nft_rejected_requests_total', 'Requests turned away before doing any work, by reason', ('reason',)
+)
+degraded_parts = registry.counter(
+    'nft_degraded_responses_total', 'Responses with a fallback in place of an upstream result, by part', ('part',)
+)
+deadlines_exceeded = registry.counter(
+    'nft_deadline_exceeded_total', 'Requests answered 504 because the deadline passed with no fallback', ('route',)
+)
+
+# Supported chains from SimpleHash
+SUPPORTED_CHAINS = [
+    "ethereum", "polygon", "solana", "bitcoin", "arbitrum", "optimism",
+    "base", "avalanche", "bsc", "zora", "blast", "mantle"
+]
+
+
+class Response:
+    def __init__(self, status=200, body=b'', headers=None, stream=None, encoded=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        # Iterator of bytes for responses that are written as they are produced
+        self.stream = stream
+        # EncodedBody shared with a cache entry: body, ETag and compressed copies are reused
+        self.encoded = encoded
+
+
+class HeldStream:
+    # A streamed body that keeps `context` (an ExitStack) entered until the
+    # body is exhausted or closed, since it is written after handle() returns
+    def __init__(self, stream, context):
+        self._stream = stream
+        self._context = context
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self):
+        context, self._context = self._context, None
+        if context is not None:
+            try:
+                self._stream.close()
+            finally:
+                context.close()
+
+
+def json_response(data, status=200):
+    with span('encode'):
+        body = json.dumps(data).encode()
+    return Response(status, body, {'Content-Type': 'application/json'})
+
+
+def encode_json(data):
+    with span('encode'):
+        return EncodedBody(json.dumps(data, separators=(',', ':')).encode())
+
+
+def encoded_json_response(encoded):
+    return Response(200, encoded.body, {'Content-Type': 'application/json'}, encoded=encoded)
+
+
+def error_response(status, message):
+    return json_response({'error': message}, status)
+
+
+def overloaded_response(status, message, retry_after):
+    response = error_response(status, message)
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def route_name(path):
+    # Bounded label for metrics: token ids and unknown paths are collapsed
+    path = path.split('?', 1)[0]
+    if path in API_ROUTES:
+        return path
+    if path.startswith('/api/nft/'):
+        return '/api/nft/{id}'
+    return '/api/other' if path.startswith('/api/') else 'static'
+
+
+@registry.collector
+def cache_metrics():
+    caches = {'nft': nft_cache.stats(), 'collection': collection_cache.stats()}
+    llm = llm_slots.stats()
+    prefetch = prefetcher.stats()
+    lookups = []
+    for cache, stats in caches.items():
+        for result in ('hits', 'stale_hits', 'shared_hits', 'misses'):
+            lookups.append(((cache, result), stats[result]))
+    return [
+        ('nft_cache_lookups_total', 'counter', 'Metadata cache lookups by result', ('cache', 'result'), lookups),
+        ('nft_cache_hit_ratio', 'gauge', 'Fresh, stale and shared hits over all lookups', ('cache',),
+         [((cache,), stats['hit_ratio']) for cache, stats in caches.items()]),
+        ('nft_cache_entries', 'gauge', 'Entries held in memory', ('cache',),
+         [((cache,), stats['entries']) for cache, stats in caches.items()]),
+        ('nft_llm_slots_in_use', 'gauge', 'Claude calls in flight', (), [((), llm['in_use'])]),
+        ('nft_llm_waiting', 'gauge', 'Claude calls waiting for a slot', (), [((), llm['waiting'])]),
+        ('nft_prefetch_jobs_total', 'counter', 'Prefetch jobs by outcome', ('result',),
+         [((result,), prefetch[result]) for result in PREFETCH_RESULTS]),
+        ('nft_prefetch_views_total', 'counter', 'NFT views by whether a prefetch warmed the token first', ('result',),
+         [((result,), prefetch[result]) for result in ('hits', 'late', 'misses')]),
+        ('nft_prefetch_pending', 'gauge', 'Prefetch jobs queued', (), [((), prefetch['pending'])]),
+        ('nft_chat_sessions', 'gauge', 'Live chat sessions', (), [((), chat_sessions.stats()['entries'])]),
+        ('nft_log_records_dropped_total', 'counter', 'Log records dropped because the queue was full', (),
+         [((), DroppingQueueHandler.dropped)])
+    ]
+
+
+class Api:
+    def __init__(self, simplehash_api_key=None, supported_chains=SUPPORTED_CHAINS, default_collection_name=None,
+                 compress_responses=True, prefetch=PREFETCH):
+        self.simplehash_api_key = simplehash_api_key
+        # Image URLs are signed alike by every process serving with this key
+        image_proxy.secret = signing_key(simplehash_api_key)
+        self.compress_responses = compress_responses
+        # Warms the tokens a visitor is likely to open next (core.prefetch)
+        self.prefetch = prefetch
+        self.supported_chains = supported_chains
+        self.default_collection_name = default_collection_name
+        self.nft_cache = nft_cache
+        self.collection_cache = collection_cache
+        self._lock = threading.Lock()
+        self._simplehash = None
+        self._personalities_loaded = False
+
+    @property
+    def simplehash(self):
+        # Pooled keep-alive client, built by the first request that goes upstream
+        if self._simplehash is None:
+            with self._lock:
+                if self._simplehash is None:
+                    with timed('init simplehash client'):
+                        self._simplehash = SimpleHashClient(self.simplehash_api_key)
+        return self._simplehash
+
+    @property
+    def claude(self):
+        # Cache hits never touch it, so they never import anthropic
+        return claude
+
+    def load_personalities(self):
+        # Personalities precomputed by `python -m core.warmup` or baked by `python -m core.bundle`
+        if self._personalities_loaded:
+            return 0
+        with self._lock:
+            if self._personalities_loaded:
+                return 0
+            with timed('load personality snapshot'):
+                added = personality_cache.load_snapshot()
+            self._personalities_loaded = True
+        return added
+
+    def fetch_collection_metadata(self, chain, contract_address):
+        return self.collection_cache.get_or_load(
+            collection_key(chain, contract_address), lambda: self.load_collection_metadata(chain, contract_address),
+            refresh=lambda: self.load_collection_metadata(chain, contract_address, snapshot=False)
+        )
+
+    def load_collection_metadata(self, chain, contract_address, snapshot=True):
+        # Ingested or bundled collections are served without a network hop on
+        # a miss; refreshes (snapshot=False) go to SimpleHash so nothing freezes
+        if snapshot:
+            collection_data = snapshot_store.get_collection(chain, contract_address)
+            if collection_data:
+                return collection_data
+
+        if not self.simplehash_api_key:
+            log.error("Error fetching collection metadata: SIMPLEHASH_API_KEY not configured")
+            return None
+
+        try:
+            data = self.simplehash.collection_nfts(chain, contract_address, limit=12)
+            if data and data.get('nfts'):
+                info = collection_info(data['nfts'])
+                if not info.get('name'):
+                    info['name'] = self.default_collection_name
+                return info
+            return None
+        except DeadlineExceeded:
+            raise  # e.g. no time left for a retry
+        except Exception as e:
+            if deadline_expired():
+                raise DeadlineExceeded("Deadline exceeded fetching collection metadata") from e
+            log.warning("Error fetching collection metadata", extra={
+                'chain': chain, 'contract': contract_address, 'error': str(e)
+            })
+            return None
+
+    def fetch_nft_metadata(self, chain, contract_address, token_id):
+        return self.fetch_nft_metadata_state(chain, contract_address, token_id)[0]
+
+    def fetch_nft_metadata_state(self, chain, contract_address, token_id):
+        # (nft_data, stale): stale when an expired copy answered while a refresh runs
+        return self.nft_cache.get_or_load_state(
+            nft_key(chain, contract_address, token_id), lambda: self.load_nft_metadata(chain, contract_address, token_id),
+            refresh=lambda: self.load_nft_metadata(chain, contract_address, token_id, snapshot=False)
+        )
+
+    def load_nft_metadata(self, chain, contract_address, token_id, snapshot=True):
+        if snapshot:
+            nft_data = snapshot_store.get_nft(chain, contract_address, token_id)
+            if nft_data:
+                return nft_data
+
+        try:
+            return self.simplehash.nft(chain, contract_address, token_id)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if deadline_expired():
+                raise DeadlineExceeded("Deadline exceeded fetching NFT metadata") from e
+            log.warning("Error fetching NFT metadata", extra={'token_id': token_id, 'error': str(e)})
+            return None
+
+    def view_personality(self, nft_data, language):
+        self.load_personalities()
+        return view_personality(self.claude, nft_data, language)
+
+    def handle(self, method, path, headers=None, body=b'', client=None):
+        # headers: dict with lower-cased names; client: the caller's IP, for rate limiting
+        with span('parse'):
+            parsed_url = urlparse(path)
+            query = parse_qs(parsed_url.query)
+        headers = headers or {}
+        wait = 0 if parsed_url.path in RATE_LIMIT_EXEMPT else client_limiter.check(client)
+        if wait:
+            rejected_requests.inc('rate_limited')
+            response = overloaded_response(429, 'Too many requests', wait)
+        else:
+            # Every upstream call below sizes its timeout from this budget
+            budget = CHAT_DEADLINE if parsed_url.path == '/api/chat' else REQUEST_DEADLINE
+            with ExitStack() as foreground:
+                foreground.enter_context(prefetcher.foreground())
+                try:
+                    with deadline(budget):
+                        response = self.route(method, parsed_url, query, headers, body, client)
+                except Overloaded as e:
+                    rejected_requests.inc(f"llm_{e.reason}")
+                    response = overloaded_response(503, str(e), e.retry_after)
+                except DeadlineExceeded as e:
+                    # Nothing cached to fall back on
+                    deadlines_exceeded.inc(route_name(parsed_url.path))
+                    response = error_response(504, str(e))
+                except Exception as e:
+                    # A bug in a route still gets a JSON answer on both entry points
+                    log.exception("Unhandled error", extra={'route': route_name(parsed_url.path), 'error': str(e)})
+                    response = error_response(500, 'Internal server error')
+                if response.stream is not None:
+                    # A streamed reply (chat SSE) keeps Claude busy until it closes; prefetches wait until then
+                    response.stream = HeldStream(response.stream, foreground.pop_all())
+        with span('finalize'):
+            return finalize(response, method, parsed_url.path, headers, allow_compression=self.compress_responses)
+
+    def route(self, method, parsed_url, query, headers, body, client=None):
+        if method in ('GET', 'HEAD'):
+            if parsed_url.path == '/api/chains':
+                return json_response({'chains': self.supported_chains})
+            if parsed_url.path == '/api/cache/stats':
+                return self.cache_stats()
+            if parsed_url.path == '/api/startup':
+                return json_response(startup_report())
+            if parsed_url.path == '/api/metrics':
+                return Response(200, registry.render().encode(), {'Content-Type': 'text/plain; version=0.0.4'})
+            if parsed_url.path == '/api/collection':
+                return self.collection(query, client)
+            if parsed_url.path == '/api/nfts':
+                return self.nfts(query)
+            if parsed_url.path == '/api/search':
+                return self.search(query)
+            if parsed_url.path == '/api/image':
+                return self.image(query, headers)
+            if parsed_url.path.startswith('/api/nft/'):
+                return self.nft(parsed_url.path.split('/')[-1], query, client)
+
+        if method == 'POST' and parsed_url.path == '/api/chat':
+            return self.chat(body, headers)
+
+        return error_response(404, 'Not found')
+
+    def cache_stats(self):
+        # Cache hit/miss/eviction counters
+        return json_response({
+            'nft': self.nft_cache.stats(),
+            'collection': self.collection_cache.stats(),
+            'personality': dict(
+                personality_cache.stats(),
+                coalesced=personality_flights.stats()['coalesced'],
+                polishing=polish_stats()['pending']
+            ),
+            'chat_sessions': chat_sessions.stats(),
+            'prefetch': prefetcher.stats(),
+            'admission': {'clients': client_limiter.stats(), 'llm': llm_slots.stats()},
+            'images': image_proxy.stats()
+        })
+
+    def collection(self, query, client=None):
+        # Slim by default; ?fields=name,nfts.token_id picks fields and ?fields=* returns everything
+        chain = query.get('chain', [None])[0]
+        contract_address = query.get('contract', [None])[0]
+
+        if not chain or not contract_address:
+            return error_response(400, 'Missing chain or contract address')
+        try:
+            fields = parse_fields(query.get('fields', [None])[0], COLLECTION_FIELDS)
+        except ValueError as e:
+            return error_response(400, str(e))
+
+        # Cache hits reuse the bytes encoded for the first request with these fields
+        encoded = self.collection_cache.get_or_load_encoded(
+            collection_key(chain, contract_address),
+            lambda: self.load_collection_metadata(chain, contract_address),
+            fields,
+            lambda collection_data: encode_json(project(collection_with_thumbnails(collection_data), fields)),
+            refresh=lambda: self.load_collection_metadata(chain, contract_address, snapshot=False)
+        )
+        if encoded is None:
+            return error_response(404, 'Collection not found')
+        if self.prefetch:
+            self.prefetch_tokens(client, chain, contract_address, 'en-US', self.grid_ids(chain, contract_address))
+        return encoded_json_response(encoded)
+
+    def nfts(self, query):
+        # Fetch several NFTs in one round trip: /api/nfts?ids=1,2,3
+        chain = query.get('chain', [DEFAULT_CHAIN])[0]
+        contract_address = query.get('contract', [DEFAULT_CONTRACT])[0]
+        token_ids = parse_token_ids(query.get('ids', [''])[0])
+
+        if len(token_ids) > BATCH_MAX_IDS:
+            return error_response(400, f'At most {BATCH_MAX_IDS} ids per request')
+
+        if token_ids:
+            batch = fetch_nft_batch(self.simplehash, chain, contract_address, token_ids)
+            return json_response(dict(batch, nfts=[with_thumbnails(nft) for nft in batch['nfts']]))
+
+        # Without ids, return the collection's preview tokens
+        collection_data = self.fetch_collection_metadata(chain, contract_address)
+        if not collection_data:
+            return error_response(404, 'Collection not found')
+        return json_response({
+            'nfts': [with_thumbnails(nft) for nft in collection_data['nfts']], 'not_found': [], 'errors': {}
+        })
+
+    def search(self, query):
+        # Multi-trait search and rarity ranking: /api/search?trait=Hair Color:Blonde&trait=Tears:Yes
+        traits = lazy_import('core.traits')  # pulls in numpy
+        chain = query.get('chain', [DEFAULT_CHAIN])[0]
+        contract_address = query.get('contract', [DEFAULT_CONTRACT])[0]
+        sort = query.get('sort', ['rarity'])[0]
+
+        try:
+            filters = traits.parse_trait_filters(query.get('trait', []))
+        except ValueError as e:
+            return error_response(400, str(e))
+        try:
+            limit = max(1, min(int(query.get('limit', ['20'])[0]), traits.SEARCH_MAX_LIMIT))
+            offset = max(int(query.get('offset', ['0'])[0]), 0)
+        except ValueError:
+            return error_response(400, 'limit and offset must be integers')
+
+        index = traits.get_trait_index(
+            chain, contract_address,
+            lambda: (self.fetch_collection_metadata(chain, contract_address) or {}).get('nfts')
+        )
+        if not index:
+            return error_response(404, 'Collection not found')
+
+        total, results = index.search(filters, sort=sort, limit=limit, offset=offset)
+        return json_response({
+            'total': total, 'indexed': index.size, 'results': [with_thumbnails(result) for result in results]
+        })
+
+    def nft(self, token_id, query, client=None):
+        chain = query.get('chain', [None])[0]
+        contract_address = query.get('contract', [None])[0]
+        language = query.get('language', ['en-US'])[0]
+
+        if not chain or not contract_address:
+            return error_response(400, 'Missing chain or contract address')
+
+        if self.prefetch:
+            prefetcher.viewed((chain, contract_address, token_id, language))
+        nft_data, stale = self.fetch_nft_metadata_state(chain, contract_address, token_id)
+        if not nft_data:
+            return error_response(404, 'NFT not found')
+        personality, source = self.view_personality(nft_data, language)
+        # Parts answered by a fallback instead of a current upstream result
+        degraded = []
+        if stale:
+            degraded.append('metadata')
+        if source == 'template':
+            degraded.append('personality')
+        for part in degraded:
+            degraded_parts.inc(part)
+        # with_thumbnails copies, so the cached entry isn't mutated
+        data = dict(with_thumbnails(nft_data), generated_personality=personality, personality_source=source)
+        if degraded:
+            data['degraded'] = degraded
+        response = json_response(data)
+        if source == 'template':
+            # Claude's version replaces it shortly; the ETag changes when it does
+            response.headers['Cache-Control'] = REVALIDATE
+        if self.prefetch:
+            # Next and previous tokens first, then the rest of the grid from here on
+            candidates = neighbor_ids(token_id) + grid_after(self.grid_ids(chain, contract_address), token_id)
+            self.prefetch_tokens(client, chain, contract_address, language,
+                                 [candidate for candidate in candidates if candidate != token_id])
+        return response
+
+    def grid_ids(self, chain, contract_address):
+        # Token ids of the collection page the client shows, if it is cached
+        collection_data = self.collection_cache.peek(collection_key(chain, contract_address)) or {}
+        return [str(nft.get('token_id')) for nft in collection_data.get('nfts') or []]
+
+    def prefetch_tokens(self, client, chain, contract_address, language, token_ids):
+        keys = [(chain, contract_address, token_id, language) for token_id in dict.fromkeys(token_ids)]
+        prefetcher.schedule(client, keys[:PREFETCH_PER_VIEW], self.prefetch_token)
+
+    def prefetch_token(self, prefetch_key):
+        # Runs on a prefetch worker: metadata, then Claude's personality for it
+        chain, contract_address, token_id, language = prefetch_key
+        key = nft_key(chain, contract_address, token_id)
+        nft_data = self.nft_cache.peek(key)
+        warm = nft_data is not None
+        if nft_data is None:
+            nft_data = self.grid_nft(chain, contract_address, token_id)
+            if nft_data is not None:
+                # Collection pages carry the same NFT objects as the single-token endpoint
+                self.nft_cache.set(key, nft_data)
+            else:
+                nft_data = self.fetch_nft_metadata(chain, contract_address, token_id)
+        if not nft_data:
+            return 'failed'
+        if PERSONALITY_POLISH:
+            self.load_personalities()
+            personality = prefetch_personality(self.claude, nft_data, language)
+            if personality == 'failed':
+                return 'failed'
+            warm = warm and personality == 'cached'
+        return 'warm' if warm else 'completed'
+
+    def grid_nft(self, chain, contract_address, token_id):
+        collection_data = self.collection_cache.peek(collection_key(chain, contract_address)) or {}
+        for nft in collection_data.get('nfts') or []:
+            if str(nft.get('token_id')) == token_id:
+                return nft
+        return None
+
+    def image(self, query, headers):
+        # Resized same-origin copies of remote NFT images: /api/image?w=480&url=...&sig=...
+        source_url = query.get('url', [None])[0]
+        if not source_url:
+            return error_response(400, 'Missing url')
+        try:
+            width = int(query.get('w', ['480'])[0])
+        except ValueError:
+            return error_response(400, 'Invalid width')
+        try:
+            data, content_type = image_proxy.thumbnail(
+                source_url, width, headers.get('accept'), query.get('sig', [None])[0]
+            )
+        except UnsupportedImage as e:
+            # Only signed URLs get this far, so this never redirects anywhere we didn't list
+            log.info("Serving original image", extra={'url': source_url, 'error': str(e)})
+            return Response(302, headers={'Location': source_url, 'Cache-Control': REVALIDATE})
+        except ImageError as e:
+            return error_response(e.status_code, str(e))
+        return Response(200, data, {'Content-Type': content_type, 'Vary': 'Accept'})
+
+    def chat(self, body, headers):
+        try:
+            with span('parse'):
+                request_data = json.loads(body or b'{}')
+        except ValueError:
+            return error_response(400, 'Invalid JSON body')
+        if not isinstance(request_data, dict):
+            return error_response(400, 'Expected a JSON object')
+
+        user_input = request_data.get('userInput', '')
+        language = request_data.get('language', 'en-US')
+        nft_id = request_data.get('nft_id', '')
+        chain = request_data.get('chain') or DEFAULT_CHAIN
+        contract_address = request_data.get('contract') or DEFAULT_CONTRACT
+
+        if not user_input:
+            return error_response(400, 'Missing user input')
+
+        try:
+            # Sessions keep the persona prompt and recent turns between requests
+            session = chat_sessions.get(request_data.get('session_id'), nft_id, language)
+            if session is None:
+                # Get NFT metadata if nft_id is provided
+                nft_data = None
+                if nft_id:
+                    nft_data = self.fetch_nft_metadata(chain, contract_address, nft_id)
+                session = chat_sessions.create(nft_id, language, build_system_prompt(nft_id, nft_data, language))
+            messages = session.messages(user_input)
+
+            log.info("Chat request", extra={
+                'session': session.id, 'nft_id': nft_id, 'language': language, 'history': len(messages) - 1
+            })
+            log.debug("Chat input", extra={'session': session.id, 'text': user_input})
+
+            if wants_stream(request_data, headers.get('accept')):
+                # Turned away now, while a 503 can still be sent instead of a broken stream
+                llm_slots.check(CHAT_PRIORITY)
+                return Response(200, headers={
+                    'Content-Type': 'text/event-stream',
+                    'X-Accel-Buffering': 'no'
+                }, stream=self.chat_events(session, messages, user_input, current_deadline()))
+
+            # Get response from Claude
+            response_text = chat_reply(self.claude, session.system, messages)
+            session.record(user_input, response_text)
+            log.debug("Chat reply", extra={'session': session.id, 'text': response_text})
+            return json_response({'response': response_text, 'session_id': session.id})
+
+        except (Overloaded, DeadlineExceeded):
+            raise
+        except Exception as e:
+            upstream_errors.inc('claude', type(e).__name__)
+            if deadline_expired():
+                raise DeadlineExceeded("Deadline exceeded waiting for Claude") from e
+            log.error("Chat request failed", extra={'error': str(e), 'type': type(e).__name__})
+            return json_response({'error': str(e), 'type': type(e).__name__}, 500)
+
+    def chat_events(self, session, messages, user_input, request_deadline):
+        # Server-Sent Events: one "sentence" event per finished sentence so the
+        # client can start speaking before the reply is complete. Closing this
+        # generator early (client gone) closes the upstream stream too. It runs
+        # after handle() has returned, so it re-enters the request's deadline.
+        sentences = []
+        stream = stream_chat_sentences(self.claude, session.system, messages)
+        try:
+            with deadline(request_deadline):
+                for sentence in stream:
+                    sentences.append(sentence)
+                    yield sse_event('sentence', {'text': sentence})
+            response_text = ' '.join(sentences)
+            session.record(user_input, response_text)
+            yield sse_event('done', {'response': response_text, 'session_id': session.id})
+        except Overloaded as e:
+            rejected_requests.inc(f"llm_{e.reason}")
+            yield sse_event('error', {'error': str(e), 'type': 'Overloaded', 'retry_after': e.retry_after})
+        except Exception as e:
+            upstream_errors.inc('claude', type(e).__name__)
+            log.error("Chat stream failed", extra={'error': str(e), 'type': type(e).__name__})
+            yield sse_event('error', {'error': str(e), 'type': type(e).__name__})
+        finally:
+            stream.close()
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from core.caches import nft_cache, nft_key
+from core.deadline import DeadlineExceeded, bind, time_left
+from core.logs import get_logger
+from core.simplehash import SIMPLEHASH_ASSETS_BATCH_SIZE
+from core.snapshot import snapshot_store
+
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', 100))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 4))
+
+log = get_logger('batch')
+
+batch_pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix='batch-fetch')
+
+
+def parse_token_ids(value):
+    # "1, 2,2,3" -> ['1', '2', '3'], keeping the caller's order
+    token_ids = []
+    for token_id in (value or '').split(','):
+        token_id = token_id.strip()
+        if token_id and token_id not in token_ids:
+            token_ids.append(token_id)
+    return token_ids
+
+
+def fetch_nft_batch(client, chain, contract_address, token_ids, cache=nft_cache, store=snapshot_store):
+    # Serves what it can from the cache and snapshot, fetches the rest through
+    # SimpleHash's multi-token endpoint in parallel chunks, and reports tokens
+    # that were not found or whose chunk failed instead of failing the batch.
+    found = {}
+    missing = []
+    for token_id in token_ids:
+        nft_data = cache.get(nft_key(chain, contract_address, token_id))
+        if nft_data is None:
+            nft_data = store.get_nft(chain, contract_address, token_id)
+            if nft_data is not None:
+                cache.set(nft_key(chain, contract_address, token_id), nft_data)
+        if nft_data is None:
+            missing.append(token_id)
+        else:
+            found[token_id] = nft_data
+
+    chunks = [missing[i:i + SIMPLEHASH_ASSETS_BATCH_SIZE] for i in range(0, len(missing), SIMPLEHASH_ASSETS_BATCH_SIZE)]
+    # Chunks still running when the request's deadline passes are reported as errors
+    fetch = bind(client.nfts_by_ids)
+    futures = [(chunk, batch_pool.submit(fetch, chain, contract_address, chunk)) for chunk in chunks]
+    errors = {}
+    for chunk, future in futures:
+        try:
+            nfts = future.result(timeout=time_left())
+        except (TimeoutError, DeadlineExceeded):
+            errors.update((token_id, "Deadline exceeded") for token_id in chunk)
+            continue
+        except Exception as e:
+            log.warning("Error fetching NFT batch", extra={'first': chunk[0], 'last': chunk[-1], 'error': str(e)})
+            errors.update((token_id, str(e)) for token_id in chunk)
+            continue
+        for nft_data in nfts:
+            token_id = str(nft_data.get('token_id'))
+            if token_id in chunk:
+                found[token_id] = nft_data
+                cache.set(nft_key(chain, contract_address, token_id), nft_data)
+
+    return {
+        'nfts': [found[token_id] for token_id in token_ids if token_id in found],
+        'not_found': [token_id for token_id in token_ids if token_id not in found and token_id not in errors],
+        'errors': errors
+    }
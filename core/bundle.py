@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from core.personality_cache import PERSONALITY_SNAPSHOT_PATH
+from core.snapshot import BUNDLED_SNAPSHOT_PATH, SCHEMA, ingest_collection, snapshot_store
+
+# Bakes collections and their personalities into data/ so a cold deploy can
+# answer /api/collection, /api/nft and /api/search without SimpleHash or
+# Claude. The snapshot is a plain rollback-journal SQLite file that the
+# server opens read-only (see SnapshotStore's bundle_path).
+
+
+def export_collection(store, chain, contract_address, output_path=BUNDLED_SNAPSHOT_PATH):
+    # Copies one collection out of the local snapshot; other bundled collections are kept
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    bundle = sqlite3.connect(output_path, isolation_level=None)
+    try:
+        bundle.execute("PRAGMA journal_mode=DELETE")
+        bundle.executescript(SCHEMA)
+        bundle.execute("ATTACH DATABASE ? AS source", (store.path,))
+        params = (chain, contract_address.lower())
+        bundle.execute("BEGIN")
+        bundle.execute("DELETE FROM main.nfts WHERE chain = ? AND contract = ?", params)
+        bundle.execute(
+            "INSERT OR REPLACE INTO main.collections SELECT * FROM source.collections WHERE chain = ? AND contract = ?",
+            params
+        )
+        copied = bundle.execute(
+            "INSERT INTO main.nfts SELECT * FROM source.nfts WHERE chain = ? AND contract = ?", params
+        ).rowcount
+        bundle.execute("COMMIT")
+        bundle.execute("DETACH DATABASE source")
+        bundle.execute("VACUUM")
+    finally:
+        bundle.close()
+    return copied
+
+
+def main():
+    from core.simplehash import SimpleHashClient
+
+    parser = argparse.ArgumentParser(description="Bake a collection snapshot and its personalities into data/")
+    parser.add_argument('chain')
+    parser.add_argument('contract')
+    parser.add_argument('--output', default=BUNDLED_SNAPSHOT_PATH, help="bundled snapshot database path")
+    parser.add_argument('--refresh', action='store_true', help="re-walk the collection before exporting")
+    parser.add_argument('--personalities-output', default=PERSONALITY_SNAPSHOT_PATH)
+    parser.add_argument('--skip-personalities', action='store_true', help="only bake the collection snapshot")
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    started = time.time()
+    client = SimpleHashClient(os.getenv('SIMPLEHASH_API_KEY'))
+    ingest = ingest_collection(snapshot_store, client, args.chain, args.contract, refresh=args.refresh)
+    if not ingest['complete']:
+        raise SystemExit("Collection ingest did not finish; rerun to resume before bundling")
+    summary = {'nfts': export_collection(snapshot_store, args.chain, args.contract, args.output)}
+
+    if not args.skip_personalities:
+        from core.clients import get_claude
+        from core.warmup import iter_collection, warm_collection
+        summary['personalities'] = warm_collection(
+            get_claude(),
+            iter_collection(client, snapshot_store, args.chain, args.contract),
+            args.personalities_output,
+            concurrency=args.concurrency
+        )
+
+    summary['bytes'] = os.path.getsize(args.output)
+    summary['seconds'] = round(time.time() - started, 2)
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import json
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from urllib.parse import unquote, urlparse
+from core.db import CACHE_DIR, connect_sqlite
+
+# Shared second tier behind the in-process TTLCaches in core.caches. Worker
+# processes (or serverless instances) pointed at the same backend fill it
+# once and read each other's entries instead of each calling SimpleHash.
+# CACHE_BACKEND=memory keeps every process on its own cache.
+
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_BACKEND_PATH = os.getenv('CACHE_BACKEND_PATH', os.path.join(CACHE_DIR, 'shared-cache.sqlite3'))
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+CACHE_REDIS_TIMEOUT = float(os.getenv('CACHE_REDIS_TIMEOUT', 0.5))
+CACHE_REDIS_PREFIX = os.getenv('CACHE_REDIS_PREFIX', 'nft:')
+# After a connection failure the backend is skipped for this long
+CACHE_BACKEND_RETRY = float(os.getenv('CACHE_BACKEND_RETRY', 5))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_entries_stale_until ON cache_entries (stale_until);
+"""
+
+
+class BackendUnavailable(Exception):
+    pass
+
+
+class CacheBackend(ABC):
+    """Shared store for TTLCache entries: JSON-serializable values with epoch-second expiry times."""
+
+    name = 'base'
+
+    @abstractmethod
+    def get(self, key):
+        # (value, expires_at, stale_until), or None once stale_until has passed
+        pass
+
+    @abstractmethod
+    def set(self, key, value, expires_at, stale_until):
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+
+class SQLiteBackend(CacheBackend):
+    """One WAL database file shared by every worker process on a host."""
+
+    name = 'sqlite'
+    PURGE_EVERY = 256  # sets between sweeps of entries past stale_until
+
+    def __init__(self, path=CACHE_BACKEND_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sets = 0
+        self._db = connect_sqlite(path)
+        # Writers from other processes wait for the lock instead of failing
+        self._db.execute("PRAGMA busy_timeout = 2000")
+        self._db.executescript(SCHEMA)
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires_at, stale_until FROM cache_entries WHERE key = ? AND stale_until > ?",
+                (key, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, key, value, expires_at, stale_until):
+        payload = json.dumps(value, default=str)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, stale_until) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, stale_until)
+            )
+            self._sets += 1
+            if self._sets % self.PURGE_EVERY == 0:
+                self._db.execute("DELETE FROM cache_entries WHERE stale_until <= ?", (time.time(),))
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+
+class RedisError(Exception):
+    pass
+
+
+class RespConnection:
+    """Blocking RESP2 connection: enough of the protocol for GET, SET and DEL."""
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    def command(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        self.sock.sendall(b''.join(parts))
+        return self.read_reply()
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError("Connection closed by Redis")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(rest)
+            return None if count < 0 else [self.read_reply() for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend(CacheBackend):
+    """Entries in any Redis-compatible server, expired by Redis once stale_until passes."""
+
+    name = 'redis'
+
+    def __init__(self, url=CACHE_REDIS_URL, timeout=CACHE_REDIS_TIMEOUT, prefix=CACHE_REDIS_PREFIX):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.strip('/') or 0)
+        self.timeout = timeout
+        self.prefix = prefix
+        self._idle = []
+        self._lock = threading.Lock()
+        self._down_until = 0
+
+    def _connect(self):
+        if time.monotonic() < self._down_until:
+            raise BackendUnavailable(f"Redis at {self.host}:{self.port} is marked down")
+        try:
+            connection = RespConnection(self.host, self.port, self.timeout)
+            if self.password:
+                connection.command('AUTH', self.password)
+            if self.db:
+                connection.command('SELECT', self.db)
+            return connection
+        except OSError:
+            self._down_until = time.monotonic() + CACHE_BACKEND_RETRY
+            raise
+
+    def _command(self, *args):
+        # Idle connections are reused; one that errored is dropped
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            reply = connection.command(*args)
+        except (OSError, RedisError):
+            connection.close()
+            raise
+        with self._lock:
+            self._idle.append(connection)
+        return reply
+
+    def get(self, key):
+        payload = self._command('GET', self.prefix + key)
+        if payload is None:
+            return None
+        entry = json.loads(payload)
+        return entry['value'], entry['expires_at'], entry['stale_until']
+
+    def set(self, key, value, expires_at, stale_until):
+        ttl_ms = int((stale_until - time.time()) * 1000)
+        if ttl_ms <= 0:
+            return
+        payload = json.dumps({'value': value, 'expires_at': expires_at, 'stale_until': stale_until}, default=str)
+        self._command('SET', self.prefix + key, payload, 'PX', ttl_ms)
+
+    def delete(self, key):
+        self._command('DEL', self.prefix + key)
+
+
+def make_backend(name=CACHE_BACKEND):
+    if name == 'memory':
+        return None
+    if name == 'sqlite':
+        return SQLiteBackend()
+    if name == 'redis':
+        return RedisBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
@@ -0,0 +1,42 @@
+import os
+from core.cache_backends import make_backend
+from core.ttl_cache import TTLCache
+
+NFT_CACHE_TTL = int(os.getenv('NFT_CACHE_TTL', 3600))
+NFT_CACHE_MAX_ENTRIES = int(os.getenv('NFT_CACHE_MAX_ENTRIES', 10000))
+NFT_CACHE_MAX_BYTES = int(os.getenv('NFT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# Floor prices and owner counts move, so collections expire sooner than tokens
+COLLECTION_CACHE_TTL = int(os.getenv('COLLECTION_CACHE_TTL', 300))
+COLLECTION_CACHE_MAX_ENTRIES = int(os.getenv('COLLECTION_CACHE_MAX_ENTRIES', 100))
+COLLECTION_CACHE_MAX_BYTES = int(os.getenv('COLLECTION_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+# How long an expired entry may still be served while it is being refreshed
+CACHE_STALE_TTL = int(os.getenv('CACHE_STALE_TTL', 86400))
+
+# Shared by both caches; None unless CACHE_BACKEND names a shared store
+shared_backend = make_backend()
+
+nft_cache = TTLCache(
+    'nft',
+    ttl=NFT_CACHE_TTL,
+    stale_ttl=CACHE_STALE_TTL,
+    max_entries=NFT_CACHE_MAX_ENTRIES,
+    max_bytes=NFT_CACHE_MAX_BYTES,
+    backend=shared_backend
+)
+
+collection_cache = TTLCache(
+    'collection',
+    ttl=COLLECTION_CACHE_TTL,
+    stale_ttl=CACHE_STALE_TTL,
+    max_entries=COLLECTION_CACHE_MAX_ENTRIES,
+    max_bytes=COLLECTION_CACHE_MAX_BYTES,
+    backend=shared_backend
+)
+
+
+def nft_key(chain, contract_address, token_id):
+    return f"{chain}_{contract_address}_{token_id}"
+
+
+def collection_key(chain, contract_address):
+    return f"{chain}_{contract_address}"
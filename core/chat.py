@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import time
+from core.clients import CLAUDE_TIMEOUT, within_deadline
+from core.concurrency import CHAT_PRIORITY, LLM_QUEUE_TIMEOUT, llm_slots
+from core.deadline import time_left
+from core.metrics import span, stage_seconds
+from core.personality import get_traits
+from core.sessions import estimate_tokens
+
+# The default doesn't support prompt caching; see PROMPT_CACHE_MIN_TOKENS
+CHAT_MODEL = os.getenv('CHAT_MODEL', "claude-3-sonnet-20240229")
+CHAT_MAX_TOKENS = 150
+# Sentences shorter than this are merged into the next one before being spoken
+SENTENCE_MIN_CHARS = 12
+
+# End punctuation (plus closing quotes/brackets) followed by whitespace, or a line break
+SENTENCE_BOUNDARY = re.compile(r'[.!?…]+["\'”’)\]]*\s+|\n+')
+
+PERSONA_PROMPT = """You are Boy #{nft_id}, a gentle and artistic soul who loves connecting with people. {traits_desc}.
+You have a warm, friendly personality and enjoy thoughtful conversations about art, emotions, and life.
+Keep your responses natural and conversational, as if chatting with a friend.
+Avoid mentioning that you're an NFT or part of a collection - just be yourself.
+When speaking, keep responses concise (2-3 sentences) and maintain a warm, genuine tone."""
+
+SPANISH_INSTRUCTION = "\nPlease respond in Spanish, maintaining the same warm and natural tone."
+
+CHAT_PROMPT_CACHING = os.getenv('CHAT_PROMPT_CACHING', '1') != '0'
+PROMPT_CACHING_BETA = "prompt-caching-2024-07-31"
+CACHE_CONTROL = {"type": "ephemeral"}
+# Models that cache prompts, and the shortest prefix (in tokens) each will cache.
+# claude-3-sonnet-20240229, the default CHAT_MODEL, does not cache at all, so
+# caching only applies once CHAT_MODEL is set to one of these.
+PROMPT_CACHE_MIN_TOKENS = {
+    "claude-3-opus-20240229": 1024,
+    "claude-3-5-sonnet-20240620": 1024,
+    "claude-3-5-sonnet-20241022": 1024,
+    "claude-3-haiku-20240307": 2048,
+    "claude-3-5-haiku-20241022": 2048,
+}
+
+
+def describe_traits(nft_data):
+    trait_map = {t['trait_type']: t['value'] for t in get_traits(nft_data)}
+
+    # Create a more natural personality description
+    personality_traits = []
+    if trait_map.get('Hair Color'):
+        personality_traits.append(f"You have {trait_map['Hair Color'].lower()} hair")
+    if trait_map.get('Eyes') and trait_map['Eyes'] != 'Regular':
+        personality_traits.append(f"{trait_map['Eyes'].lower()} eyes")
+    if trait_map.get('Clothing'):
+        personality_traits.append(f"wearing a {trait_map['Clothing'].lower()}")
+    if trait_map.get('Face Add-ons') not in (None, 'None'):
+        personality_traits.append(f"with {trait_map['Face Add-ons'].lower()}")
+    if trait_map.get('Tears') == 'Yes':
+        personality_traits.append("and you're feeling emotional right now")
+    return ', '.join(personality_traits)
+
+
+def build_system_prompt(nft_id, nft_data, language):
+    traits_desc = describe_traits(nft_data) if nft_data else ''
+    system_prompt = PERSONA_PROMPT.format(nft_id=nft_id, traits_desc=traits_desc or 'You are one of the Boys')
+    if language == 'es-ES':
+        system_prompt += SPANISH_INSTRUCTION
+    return system_prompt
+
+
+def cache_breakpoints(system, messages, model=CHAT_MODEL):
+    # Marks the system prompt, and the history before the new message, as
+    # cacheable prefixes. Only where the model caches prompts and the prefix
+    # is long enough to be cached; a persona prompt alone is far below that.
+    # Returns (system, messages, marked).
+    min_tokens = PROMPT_CACHE_MIN_TOKENS.get(model)
+    if not CHAT_PROMPT_CACHING or min_tokens is None:
+        return system, messages, False
+    marked = False
+    prefix = estimate_tokens(system)
+    if prefix >= min_tokens:
+        system = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+        marked = True
+    history = messages[:-1]
+    prefix += sum(estimate_tokens(message["content"]) for message in history)
+    if history and prefix >= min_tokens:
+        # The history up to the last reply is the stable prefix for the next turn
+        last = history[-1]
+        content = [{"type": "text", "text": last["content"], "cache_control": CACHE_CONTROL}]
+        messages = history[:-1] + [dict(last, content=content)] + messages[-1:]
+        marked = True
+    return system, messages, marked
+
+
+def chat_params(system, messages):
+    system, messages, cached = cache_breakpoints(system, messages)
+    params = {
+        "model": CHAT_MODEL,
+        "max_tokens": CHAT_MAX_TOKENS,
+        "temperature": 0.7,
+        "system": system,
+        "messages": messages
+    }
+    if cached:
+        params["extra_headers"] = {"anthropic-beta": PROMPT_CACHING_BETA}
+    return params
+
+
+def chat_reply(claude, system, messages):
+    with llm_slots.slot(CHAT_PRIORITY, time_left(LLM_QUEUE_TIMEOUT)), span('claude_chat'):
+        client = within_deadline(claude)
+        message = client.messages.create(timeout=time_left(CLAUDE_TIMEOUT), **chat_params(system, messages))
+    return message.content[0].text
+
+
+def iter_sentences(chunks, min_length=SENTENCE_MIN_CHARS):
+    # Regroups a stream of text deltas into whole sentences as soon as each one ends
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(buffer):
+            sentence = buffer[start:match.end()].strip()
+            if len(sentence) >= min_length:
+                yield sentence
+                start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def stream_chat_sentences(claude, system, messages):
+    # Closing the generator early (e.g. the client went away) aborts the upstream stream
+    started = time.perf_counter()
+    # The timeout bounds each read, so a stalled stream fails while a flowing one may finish
+    with llm_slots.slot(CHAT_PRIORITY, time_left(LLM_QUEUE_TIMEOUT)):
+        client = within_deadline(claude)
+        with client.messages.stream(timeout=time_left(CLAUDE_TIMEOUT), **chat_params(system, messages)) as stream:
+            for count, sentence in enumerate(iter_sentences(stream.text_stream)):
+                if count == 0:
+                    stage_seconds.observe(time.perf_counter() - started, 'claude_first_sentence')
+                yield sentence
+    stage_seconds.observe(time.perf_counter() - started, 'claude_stream')
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+def wants_stream(request_data, accept_header):
+    return bool(request_data.get('stream')) or 'text/event-stream' in (accept_header or '')
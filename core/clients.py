@@ -0,0 +1,44 @@
+import os
+import threading
+from core.deadline import current_deadline
+from core.startup import lazy_import, timed
+
+# Upstream clients are built on first use rather than at import time, so a
+# cold start that only serves cached or static data never pays for them.
+
+# Longest a single Claude call may take when no request deadline is tighter
+CLAUDE_TIMEOUT = float(os.getenv('CLAUDE_TIMEOUT', 30))
+
+_lock = threading.Lock()
+_claude = None
+
+
+def get_claude():
+    global _claude
+    if _claude is None:
+        with _lock:
+            if _claude is None:
+                anthropic = lazy_import('anthropic')
+                with timed('init claude client'):
+                    _claude = anthropic.Client(api_key=os.getenv('ANTHROPIC_API_KEY'), timeout=CLAUDE_TIMEOUT)
+    return _claude
+
+
+def within_deadline(client):
+    # Under a request deadline a retry rarely fits, so the caller's fallback answers instead
+    if current_deadline() is None:
+        return client
+    return client.with_options(max_retries=0)
+
+
+class LazyClient:
+    """Stands in for a client until an attribute (e.g. .messages) is first used."""
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+
+
+claude = LazyClient(get_claude)
@@ -0,0 +1,204 @@
+import heapq
+import itertools
+import math
+import os
+import http.server
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 16))
+SERVER_MAX_PENDING = int(os.getenv('SERVER_MAX_PENDING', 128))
+# Seconds a connection may sit idle (preconnects, slow request lines) before its worker drops it
+SERVER_IDLE_TIMEOUT = float(os.getenv('SERVER_IDLE_TIMEOUT', 10))
+# Processes sharing the port through SO_REUSEPORT (Linux); each runs SERVER_WORKERS threads
+SERVER_PROCESSES = int(os.getenv('SERVER_PROCESSES', 1))
+UPSTREAM_CONCURRENCY = int(os.getenv('UPSTREAM_CONCURRENCY', 8))
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', 4))
+LLM_MAX_WAITING = int(os.getenv('LLM_MAX_WAITING', 16))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 10))
+
+# Lower runs first: a viewer mid-conversation beats a personality for a page load
+CHAT_PRIORITY = 0
+PERSONALITY_PRIORITY = 1
+PREFETCH_PRIORITY = 2
+
+# Caps in-flight SimpleHash calls independently of the HTTP worker count, so
+# static files and cache hits keep flowing while upstream is slow.
+upstream_slots = threading.BoundedSemaphore(UPSTREAM_CONCURRENCY)
+
+OVERLOADED_RESPONSE = (
+    b"HTTP/1.0 503 Service Unavailable\r\n"
+    b"Retry-After: 1\r\n"
+    b"Content-Length: 0\r\n"
+    b"Connection: close\r\n\r\n"
+)
+
+
+class Overloaded(Exception):
+    """Raised instead of queueing work that could not start in time."""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Waiter:
+    __slots__ = ('event', 'granted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class PrioritySlots:
+    """Semaphore that hands freed slots to the highest-priority waiter, with a bounded wait queue."""
+
+    def __init__(self, slots, max_waiting, timeout):
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.rejected = {'queue_full': 0, 'queue_timeout': 0, 'preempted': 0}
+        self._available = slots
+        self._waiters = []  # heap of (priority, arrival, Waiter)
+        self._arrivals = itertools.count()
+        self._held = 1.0  # moving average of seconds a slot is held, for Retry-After
+        self._lock = threading.Lock()
+
+    def _retry_after(self):
+        return max(1, math.ceil(self._held * (len(self._waiters) + 1) / self.slots))
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        return Overloaded("Too many Claude requests in flight", reason, self._retry_after())
+
+    def _make_room(self, priority):
+        # With the queue full, a waiter of lower priority gives up its place
+        if len(self._waiters) < self.max_waiting:
+            return True
+        if not self._waiters:
+            return False
+        entry = max(self._waiters)
+        if entry[0] <= priority:
+            return False
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+        self.rejected['preempted'] += 1
+        entry[2].event.set()
+        return True
+
+    def check(self, priority):
+        # Raises Overloaded if acquire(priority) would be turned away right now
+        with self._lock:
+            if self._available or len(self._waiters) < self.max_waiting:
+                return
+            if self._waiters and max(self._waiters)[0] > priority:
+                return
+            raise self._reject('queue_full')
+
+    def acquire(self, priority, timeout=None):
+        with self._lock:
+            if self._available and not self._waiters:
+                self._available -= 1
+                return
+            if not self._make_room(priority):
+                raise self._reject('queue_full')
+            waiter = Waiter()
+            entry = (priority, next(self._arrivals), waiter)
+            heapq.heappush(self._waiters, entry)
+
+        waiter.event.wait(self.timeout if timeout is None else timeout)
+        with self._lock:
+            if waiter.granted:
+                return
+            if waiter.event.is_set():
+                raise Overloaded("Displaced by higher-priority Claude requests", 'preempted', self._retry_after())
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            raise self._reject('queue_timeout')
+
+    def release(self, held_for=None):
+        with self._lock:
+            if held_for is not None:
+                self._held = 0.8 * self._held + 0.2 * held_for
+            if self._waiters:
+                # The slot passes straight to the next waiter
+                waiter = heapq.heappop(self._waiters)[2]
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._available += 1
+
+    @contextmanager
+    def slot(self, priority, timeout=None):
+        self.acquire(priority, timeout)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'in_use': self.slots - self._available,
+                'waiting': len(self._waiters),
+                'rejected': dict(self.rejected)
+            }
+
+
+# Claude calls, across chat and personalities, share these slots
+llm_slots = PrioritySlots(LLM_CONCURRENCY, LLM_MAX_WAITING, LLM_QUEUE_TIMEOUT)
+
+
+class ThreadPoolHTTPServer(http.server.HTTPServer):
+    """HTTPServer that handles each connection on a bounded worker pool."""
+
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=SERVER_WORKERS, max_pending=SERVER_MAX_PENDING,
+                 reuse_port=False):
+        self.reuse_port = reuse_port
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='http-worker')
+        # Connections being handled plus connections waiting for a worker
+        self.pending = threading.BoundedSemaphore(workers + max_pending)
+
+    def server_bind(self):
+        if self.reuse_port:
+            # The kernel spreads new connections across every process bound this way
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def process_request(self, request, client_address):
+        if not self.pending.acquire(blocking=False):
+            # Saturated: shed load right away instead of growing an unbounded queue
+            self.reject_request(request)
+            return
+        self.pool.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.pending.release()
+
+    def reject_request(self, request):
+        try:
+            request.sendall(OVERLOADED_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
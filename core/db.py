@@ -0,0 +1,27 @@
+import os
+import sqlite3
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(ROOT_DIR, '.cache'))
+# Files baked into the deploy bundle by `python -m core.bundle`
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+
+
+def connect_sqlite(path):
+    # WAL lets readers proceed while a writer (e.g. an ingest job) commits
+    if path != ':memory:':
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            return db
+        except (OSError, sqlite3.Error) as e:
+            # Read-only filesystems (e.g. serverless bundles) still get a per-process store
+            print(f"SQLite database unavailable at {path}, using memory: {e}")
+    return sqlite3.connect(':memory:', check_same_thread=False, isolation_level=None)
+
+
+def connect_sqlite_readonly(path):
+    # immutable=1 skips locking and WAL files, so it works on read-only bundles
+    return sqlite3.connect(f"file:{path}?immutable=1", uri=True, check_same_thread=False)
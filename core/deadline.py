@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-request time budgets. A route sets a deadline for its thread and every
+# upstream call below it (SimpleHash, Claude, image fetches, waits on
+# coalesced loads) sizes its timeout from what is left, so tail latency is
+# bounded by these settings rather than by how long upstream hangs.
+
+REQUEST_DEADLINE = float(os.getenv('REQUEST_DEADLINE', 8))
+CHAT_DEADLINE = float(os.getenv('CHAT_DEADLINE', 25))
+
+_local = threading.local()
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+@contextmanager
+def deadline(seconds_or_deadline):
+    # Also re-enters a Deadline captured on another thread (see bind)
+    previous = current_deadline()
+    if isinstance(seconds_or_deadline, Deadline):
+        _local.deadline = seconds_or_deadline
+    else:
+        _local.deadline = Deadline(seconds_or_deadline)
+    try:
+        yield _local.deadline
+    finally:
+        _local.deadline = previous
+
+
+def time_left(cap=None):
+    # Seconds left for the current request, at most `cap`; just `cap` outside a deadline
+    current = current_deadline()
+    if current is None:
+        return cap
+    left = current.remaining()
+    if left <= 0:
+        raise DeadlineExceeded(f"Request deadline of {current.seconds:g}s exceeded")
+    return left if cap is None else min(cap, left)
+
+
+def deadline_expired():
+    current = current_deadline()
+    return current is not None and current.expired()
+
+
+def bind(fn):
+    # Runs fn on a pool thread under the submitting request's deadline
+    current = current_deadline()
+    if current is None:
+        return fn
+
+    def bound(*args, **kwargs):
+        with deadline(current):
+            return fn(*args, **kwargs)
+    return bound
@@ -0,0 +1,57 @@
+import contextlib
+import hashlib
+import random
+import time
+from types import SimpleNamespace
+
+# Deterministic, offline stand-in for the Anthropic client. It mirrors the
+# parts of the SDK this app uses (messages.create and messages.stream) so
+# jobs like the personality warm-up can run without an API key.
+
+FAKE_PHRASES = [
+    "carries a quiet, dreamy calm",
+    "sees the world in soft brushstrokes",
+    "wears every feeling openly",
+    "finds poetry in small moments"
+]
+
+
+class FakeMessages:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def _reply(self, messages, system=None):
+        self.calls += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            raise RuntimeError("Fake LLM error")
+        prompt = (system or '') + str(messages[-1]['content'])
+        digest = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16)
+        traits = [line.strip() for line in prompt.splitlines() if ': ' in line and not line.strip().startswith('-')]
+        described = ', '.join(traits[:3]) or 'a gentle soul'
+        return f"This Boy with {described} {FAKE_PHRASES[digest % len(FAKE_PHRASES)]}. He loves art and honest conversation."
+
+    def create(self, model, messages, system=None, **kwargs):
+        text = self._reply(messages, system)
+        return SimpleNamespace(content=[SimpleNamespace(type='text', text=text)], model=model)
+
+    @contextlib.contextmanager
+    def stream(self, model, messages, system=None, **kwargs):
+        text = self._reply(messages, system)
+        words = text.split(' ')
+        yield SimpleNamespace(text_stream=(word + (' ' if i < len(words) - 1 else '') for i, word in enumerate(words)))
+
+
+class FakeClaude:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.messages = FakeMessages(latency, jitter, error_rate, seed)
+
+    def with_options(self, **options):
+        # Retries and timeouts mean nothing offline; the same fake serves every call
+        return self
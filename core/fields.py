@@ -0,0 +1,62 @@
+import re
+
+# `fields=` projections: a comma-separated list of dotted paths, e.g.
+# fields=name,floor_prices,nfts.token_id. A path into a list applies to each
+# item. `fields=*` returns everything.
+
+FIELDS_MAX = 32
+FIELD_PATH = re.compile(r'^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$')
+
+# What the web client renders for a collection
+COLLECTION_FIELDS = (
+    'name', 'description', 'image_url', 'banner_image_url', 'floor_prices', 'distinct_nft_count',
+    'distinct_owner_count', 'external_url', 'twitter_username', 'discord_url',
+    'nfts.token_id', 'nfts.name', 'nfts.image_url'
+)
+
+
+def parse_fields(value, default):
+    # Sorted tuple of paths, or None for every field; also used as a cache key
+    if value is None or value == '':
+        return tuple(sorted(default))
+    if value.strip() == '*':
+        return None
+    paths = sorted({path.strip() for path in value.split(',') if path.strip()})
+    if len(paths) > FIELDS_MAX:
+        raise ValueError(f"At most {FIELDS_MAX} fields per request")
+    for path in paths:
+        if not FIELD_PATH.match(path):
+            raise ValueError(f"Invalid field: {path}")
+    return tuple(paths)
+
+
+def field_tree(paths):
+    # ('a', 'b.c', 'b.d') -> {'a': None, 'b': {'c': None, 'd': None}}; None keeps the whole value
+    tree = {}
+    for path in paths:
+        node = tree
+        parts = path.split('.')
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                break  # a parent path already keeps everything below it
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def apply_tree(value, tree):
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [apply_tree(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {name: apply_tree(value[name], subtree) for name, subtree in tree.items() if name in value}
+
+
+def project(data, paths):
+    if paths is None:
+        return data
+    return apply_tree(data, field_tree(paths))
@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Compression, strong ETags and per-route Cache-Control for responses built
+# by core.app (and static files in server.py).
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Fast enough to compress per response
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+# Metadata changes rarely but floor prices drift, so browsers keep it briefly
+# and may reuse it while revalidating
+METADATA_MAX_AGE = int(os.getenv('METADATA_MAX_AGE', 60))
+METADATA_CACHE_CONTROL = f"public, max-age={METADATA_MAX_AGE}, stale-while-revalidate={METADATA_MAX_AGE * 5}"
+NO_STORE = 'no-store'
+REVALIDATE = 'no-cache'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+CACHE_POLICIES = [
+    ('/api/chains', 'public, max-age=3600'),
+    ('/api/collection', METADATA_CACHE_CONTROL),
+    ('/api/nfts', METADATA_CACHE_CONTROL),
+    ('/api/nft/', METADATA_CACHE_CONTROL),
+    ('/api/search', METADATA_CACHE_CONTROL),
+    ('/api/image', IMMUTABLE),  # thumbnails of a given source and width never change
+    ('/api/', NO_STORE),  # chat, stats and anything new stay uncached unless listed above
+]
+
+# app.3f9c2a1b.js style names: the content hash is in the URL, so they never change
+HASHED_ASSET = re.compile(r'\.[0-9a-f]{8,}\.[A-Za-z0-9]+$')
+
+
+def cache_control_for(path):
+    for prefix, policy in CACHE_POLICIES:
+        if path.startswith(prefix):
+            return policy
+    if HASHED_ASSET.search(path):
+        return IMMUTABLE
+    # Other static files (index.html, unhashed assets) are revalidated with their ETag
+    return REVALIDATE
+
+
+def negotiate_encoding(accept_encoding):
+    # Picks br or gzip from Accept-Encoding, honouring q=0; None means identity
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            offered[coding.strip().lower()] = quality
+    wildcard = offered.get('*', 0.0)
+    for coding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if offered.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def strong_etag(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def is_compressible(content_type):
+    return (content_type or '').startswith(COMPRESSIBLE_TYPES)
+
+
+class EncodedBody:
+    """Response bytes with their ETag and compressed copies, computed once and reused across requests."""
+
+    __slots__ = ('body', 'etag', '_compressed')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = strong_etag(body)
+        self._compressed = {}
+
+    def __len__(self):
+        return len(self.body)
+
+    def compressed(self, encoding):
+        # Two requests racing here both compress; either copy is correct
+        data = self._compressed.get(encoding)
+        if data is None:
+            data = self._compressed[encoding] = compress(self.body, encoding)
+        return data
+
+
+def finalize(response, method, path, headers, allow_compression=True):
+    # Adds Cache-Control, ETag and Content-Encoding to a buffered response and
+    # turns it into a 304 when the client already has this representation.
+    # headers: request headers with lower-cased names.
+    if response.stream is not None:
+        response.headers.setdefault('Cache-Control', NO_STORE)
+        return response
+    if response.status >= 400:
+        response.headers.setdefault('Cache-Control', NO_STORE)
+        return response
+
+    response.headers.setdefault('Cache-Control', cache_control_for(path))
+    if method not in ('GET', 'HEAD') or response.status != 200:
+        return response
+
+    encoding = None
+    if allow_compression and is_compressible(response.headers.get('Content-Type')):
+        response.headers['Vary'] = 'Accept-Encoding'
+        if len(response.body) >= COMPRESS_MIN_BYTES:
+            encoding = negotiate_encoding(headers.get('accept-encoding'))
+
+    # Each encoding is a different representation, so it gets its own strong tag
+    etag = response.encoded.etag if response.encoded is not None else strong_etag(response.body)
+    if encoding:
+        etag = etag[:-1] + '-' + encoding + '"'
+    response.headers['ETag'] = etag
+
+    if etag_matches(headers.get('if-none-match'), etag):
+        response.status = 304
+        response.body = b''
+        response.headers.pop('Content-Type', None)
+        return response
+
+    if encoding:
+        if response.encoded is not None:
+            response.body = response.encoded.compressed(encoding)
+        else:
+            response.body = compress(response.body, encoding)
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,344 @@
+import hashlib
+import hmac
+import io
+import ipaddress
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import time
+from urllib.parse import quote, urlparse
+from core.db import CACHE_DIR
+from core.deadline import time_left
+from core.metrics import span, upstream_errors
+from core.singleflight import SingleFlight
+from core.startup import lazy_import
+
+# /api/image fetches each remote image once, resizes it to a few fixed widths
+# and keeps source and thumbnails in a size-bounded directory, so browsers get
+# small same-origin files instead of full-resolution CDN originals.
+
+IMAGE_PROXY = os.getenv('IMAGE_PROXY', '1') == '1'
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(CACHE_DIR, 'images'))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+IMAGE_MAX_SOURCE_BYTES = int(os.getenv('IMAGE_MAX_SOURCE_BYTES', 20 * 1024 * 1024))
+IMAGE_FETCH_TIMEOUT = float(os.getenv('IMAGE_FETCH_TIMEOUT', 10))
+IMAGE_FETCH_CONCURRENCY = int(os.getenv('IMAGE_FETCH_CONCURRENCY', 4))
+# Only for local testing against image servers on private addresses
+IMAGE_PROXY_ALLOW_PRIVATE = os.getenv('IMAGE_PROXY_ALLOW_PRIVATE', '0') == '1'
+# Signs the image URLs put into API responses; only signed URLs are proxied
+IMAGE_PROXY_SECRET = os.getenv('IMAGE_PROXY_SECRET')
+
+# Logo, NFT card and banner sizes; other widths are rejected so the cache stays bounded
+IMAGE_WIDTHS = (160, 480, 1024)
+LOGO_WIDTH = 160
+NFT_WIDTH = 480
+BANNER_WIDTH = 1024
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+# Sources that resize to an equivalent still image. SVG, video and animated
+# GIFs would be broken or flattened, so they keep their original URL.
+RASTER_TYPES = ('image/png', 'image/jpeg', 'image/webp', 'image/bmp')
+RASTER_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+
+class ImageError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class UnsupportedImage(ImageError):
+    # The source was fetched but can't be resized; clients get the original instead
+    def __init__(self, message):
+        super().__init__(message, 502)
+
+
+def is_raster(source_url, mime_type=None):
+    # SimpleHash reports the type in image_properties; otherwise go by the extension
+    if mime_type:
+        return mime_type.lower() in RASTER_TYPES
+    return urlparse(source_url).path.lower().endswith(RASTER_EXTENSIONS)
+
+
+def signing_key(simplehash_api_key=None):
+    # Every process and instance must sign alike: IMAGE_PROXY_SECRET, else derived
+    # from the SimpleHash key the server runs with, else random (signed URLs then
+    # only work in this process)
+    if IMAGE_PROXY_SECRET:
+        return IMAGE_PROXY_SECRET.encode('utf-8')
+    if simplehash_api_key:
+        return ('image-proxy:' + simplehash_api_key).encode('utf-8')
+    return secrets.token_hex(32).encode('utf-8')
+
+
+def url_signature(source_url):
+    return hmac.new(image_proxy.secret, source_url.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+
+def thumbnail_url(source_url, width, mime_type=None):
+    if not IMAGE_PROXY or not source_url or not source_url.startswith(('http://', 'https://')):
+        return source_url
+    if not is_raster(source_url, mime_type):
+        return source_url
+    return f"/api/image?w={width}&url={quote(source_url, safe='')}&sig={url_signature(source_url)}"
+
+
+def with_thumbnails(nft):
+    # Copy of an NFT whose image_url points at the proxy; the original stays in source_image_url
+    if not IMAGE_PROXY or not nft.get('image_url'):
+        return nft
+    mime_type = (nft.get('image_properties') or {}).get('mime_type')
+    if thumbnail_url(nft['image_url'], NFT_WIDTH, mime_type) == nft['image_url']:
+        return nft
+    return dict(
+        nft,
+        image_url=thumbnail_url(nft['image_url'], NFT_WIDTH, mime_type),
+        source_image_url=nft['image_url'],
+        image_thumbnails={str(width): thumbnail_url(nft['image_url'], width, mime_type) for width in IMAGE_WIDTHS}
+    )
+
+
+def collection_with_thumbnails(collection):
+    if not IMAGE_PROXY:
+        return collection
+    return dict(
+        collection,
+        image_url=thumbnail_url(collection.get('image_url'), LOGO_WIDTH),
+        banner_image_url=thumbnail_url(collection.get('banner_image_url'), BANNER_WIDTH),
+        nfts=[with_thumbnails(nft) for nft in collection.get('nfts') or []]
+    )
+
+
+def check_signature(source_url, signature):
+    # Only URLs this app put into NFT or collection metadata; the proxy is not open
+    if not signature or not hmac.compare_digest(url_signature(source_url), signature):
+        raise ImageError("Unknown image URL", 403)
+
+
+def resolve_public_host(url):
+    # The address to connect to. Refuses loopback, private and link-local
+    # addresses; the fetch connects to the address checked here, so the host
+    # can't be re-resolved to a private one in between.
+    parsed = urlparse(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ImageError("Only http(s) image URLs are supported", 400)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    try:
+        addresses = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        raise ImageError("Image host not found", 502)
+    if not IMAGE_PROXY_ALLOW_PRIVATE:
+        for address in addresses:
+            if not ipaddress.ip_address(address[4][0]).is_global:
+                raise ImageError("Image host is not public", 403)
+    return addresses[0][4][0], port
+
+
+class DiskCache:
+    """Files in one directory, evicted least-recently-used past max_bytes."""
+
+    def __init__(self, directory, max_bytes):
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            # Read-only bundles (Vercel) can still write to the temp dir
+            directory = os.path.join(tempfile.gettempdir(), 'nft-images')
+            os.makedirs(directory, exist_ok=True)
+            print(f"Image cache directory unavailable ({e}), using {directory}")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = {}  # name -> [size, last_used]
+        self.size = 0
+        for name in os.listdir(directory):
+            if name.endswith('.tmp'):
+                continue
+            stat = os.stat(os.path.join(directory, name))
+            self._entries[name] = [stat.st_size, stat.st_mtime]
+            self.size += stat.st_size
+
+    def get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            entry[1] = max(entry[1], time.time())
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            # Removed behind our back; forget it so the next put rewrites it
+            with self._lock:
+                if self._entries.pop(name, None) is not None:
+                    self.size -= entry[0]
+            return None
+
+    def put(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            previous = self._entries.get(name)
+            if previous:
+                self.size -= previous[0]
+            self._entries[name] = [len(data), time.time()]
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Down to 90% so a full cache doesn't evict on every write
+        target = self.max_bytes * 0.9
+        for name, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self.size <= target:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            del self._entries[name]
+            self.size -= size
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.size, 'max_bytes': self.max_bytes}
+
+
+class ImageProxy:
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES, secret=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # HMAC key for thumbnail URLs; Api sets it from the key it was given
+        self.secret = secret or signing_key()
+        self._cache = None
+        self._lock = threading.Lock()
+        self._fetch_slots = threading.BoundedSemaphore(IMAGE_FETCH_CONCURRENCY)
+        self._flights = SingleFlight()
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = DiskCache(self.cache_dir, self.max_bytes)
+        return self._cache
+
+    def thumbnail(self, source_url, width, accept='', signature=None):
+        # Returns (bytes, content_type); WebP for browsers that accept it, JPEG otherwise
+        if width not in IMAGE_WIDTHS:
+            raise ImageError(f"Width must be one of {', '.join(map(str, IMAGE_WIDTHS))}", 400)
+        check_signature(source_url, signature)
+        image_format = 'webp' if 'image/webp' in (accept or '') else 'jpeg'
+        digest = hashlib.sha256(source_url.encode('utf-8')).hexdigest()[:40]
+        name = f"{digest}-{width}.{image_format}"
+
+        data = self.cache.get(name)
+        if data is None:
+            data = self._flights.do(name, lambda: self._render(source_url, digest, width, image_format, name))
+        return data, f"image/{image_format}"
+
+    def _render(self, source_url, digest, width, image_format, name):
+        data = self.cache.get(name)
+        if data is not None:
+            return data
+        source = self._source(source_url, digest)
+        with span('image_resize'):
+            data = resize(source, width, image_format)
+        self.cache.put(name, data)
+        return data
+
+    def _source(self, source_url, digest):
+        # The original is kept too, so other widths and formats don't refetch it
+        name = f"{digest}.src"
+        data = self.cache.get(name)
+        if data is None:
+            data = self._flights.do(name, lambda: self._fetch(source_url, name))
+        return data
+
+    def _fetch(self, source_url, name):
+        data = self.cache.get(name)
+        if data is not None:
+            return data
+        address, port = resolve_public_host(source_url)
+        urllib3 = lazy_import('urllib3')
+        try:
+            with self._fetch_slots, span('image_fetch'):
+                response = connection_pool(urllib3, source_url, address, port).urlopen(
+                    'GET', request_target(source_url), headers={'Host': urlparse(source_url).netloc},
+                    timeout=time_left(IMAGE_FETCH_TIMEOUT), redirect=False, retries=False, preload_content=False
+                )
+                try:
+                    if response.status != 200:
+                        raise ImageError(f"Image source returned {response.status}", 502)
+                    if not response.headers.get('Content-Type', '').startswith('image/'):
+                        raise UnsupportedImage("Image source did not return an image")
+                    chunks = []
+                    received = 0
+                    for chunk in response.stream(64 * 1024):
+                        received += len(chunk)
+                        if received > IMAGE_MAX_SOURCE_BYTES:
+                            raise ImageError("Image source is too large", 502)
+                        chunks.append(chunk)
+                finally:
+                    response.release_conn()
+        except urllib3.exceptions.HTTPError as e:
+            upstream_errors.inc('image', type(e).__name__)
+            raise ImageError(f"Image source unavailable: {e}", 502)
+        data = b''.join(chunks)
+        self.cache.put(name, data)
+        return data
+
+    def stats(self):
+        return dict(self.cache.stats(), **self._flights.stats())
+
+
+def request_target(url):
+    parsed = urlparse(url)
+    return (parsed.path or '/') + (f"?{parsed.query}" if parsed.query else '')
+
+
+def connection_pool(urllib3, url, address, port):
+    # Connects to the checked address; TLS still verifies the certificate for the URL's host
+    parsed = urlparse(url)
+    if parsed.scheme == 'https':
+        certifi = lazy_import('certifi')
+        return urllib3.HTTPSConnectionPool(
+            address, port, maxsize=1, server_hostname=parsed.hostname, assert_hostname=parsed.hostname,
+            cert_reqs='CERT_REQUIRED', ca_certs=certifi.where()
+        )
+    return urllib3.HTTPConnectionPool(address, port, maxsize=1)
+
+
+def resize(source, width, image_format):
+    Image = lazy_import('PIL.Image')
+    ImageOps = lazy_import('PIL.ImageOps')
+    try:
+        image = Image.open(io.BytesIO(source))
+        # JPEG sources decode at a reduced scale directly, skipping most of the pixels
+        image.draft('RGB', (width, width))
+        image = ImageOps.exif_transpose(image)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise UnsupportedImage(f"Unsupported image: {e}")
+
+    output = io.BytesIO()
+    try:
+        # Pixels are decoded here, so a truncated source fails here too
+        image.thumbnail((width, width * 4), Image.LANCZOS)  # never upscales
+        if image_format == 'webp':
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+            image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+        else:
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    except (OSError, ValueError) as e:
+        raise UnsupportedImage(f"Unsupported image: {e}")
+    return output.getvalue()
+
+
+image_proxy = ImageProxy()
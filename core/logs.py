@@ -0,0 +1,89 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# Log records are queued on the request path and written to stdout by a
+# background listener, so a slow terminal or log collector never stalls a
+# request. LOG_FORMAT=json emits one JSON object per line. Serverless entry
+# points write synchronously instead: their instances are frozen as soon as
+# the response is sent, which would strand queued records.
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+
+# Attributes every LogRecord has; anything else came in through extra={...}
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_configured = False
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        fields = {name: value for name, value in vars(record).items() if name not in RECORD_ATTRIBUTES}
+        if fields:
+            line += ' ' + ' '.join(f"{name}={value}" for name, value in fields.items())
+        return line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Drops records instead of blocking when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+def configure_logging(queued=True):
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == 'json':
+            stream.setFormatter(JsonFormatter())
+        else:
+            stream.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        logger = logging.getLogger('nft')
+        logger.setLevel(LOG_LEVEL)
+        if queued:
+            records = queue.Queue(LOG_QUEUE_SIZE)
+            listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+            listener.start()
+            atexit.register(listener.stop)  # flush what's queued on shutdown
+            logger.addHandler(DroppingQueueHandler(records))
+        else:
+            logger.addHandler(stream)
+        logger.propagate = False
+        _configured = True
+
+
+def get_logger(name):
+    return logging.getLogger(f"nft.{name}")
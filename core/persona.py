@@ -0,0 +1,113 @@
+import hashlib
+
+# Template personalities: a 2-3 sentence description built from a Boy's
+# traits with per-language phrase tables. Trait values are used exactly as
+# written, like the Claude prompt demands, so the template is accurate and
+# takes microseconds; Claude's version replaces it once generated.
+
+# Described in this order; other trait types follow alphabetically
+FEATURE_ORDER = ('Hair Color', 'Eyes', 'Face Add-ons')
+
+PHRASES = {
+    'en-US': {
+        'features': {
+            'Hair Color': "{value} hair",
+            'Eyes': "{value} eyes",
+            'Face Add-ons': "{value} on his face",
+            'Background': "a {value} background"
+        },
+        'other': "{value} {type}",  # any trait type without its own phrase
+        'wearing': ", wearing the {value}",
+        'wearing_only': "This Boy wears the {value}.",
+        'and': " and ",
+        'openings': [
+            "This Boy has {features}{wearing}.",
+            "Meet a Boy with {features}{wearing}.",
+            "Here is a Boy with {features}{wearing}."
+        ],
+        'tears': [
+            "Tears on his cheeks show a tender heart that feels every color deeply.",
+            "His tears come easily, because he feels the beauty around him so strongly."
+        ],
+        'closings': [
+            "He sees the world as a canvas and shares it with a warm smile.",
+            "Gentle and artistic, he turns quiet moments into something beautiful.",
+            "He loves slow conversations about art, feelings and the little things in life."
+        ],
+        'default': "A unique character with a gentle soul and artistic spirit."
+    },
+    'es-ES': {
+        'features': {
+            'Hair Color': "el pelo {value}",
+            'Eyes': "los ojos {value}",
+            'Face Add-ons': "{value} en la cara",
+            'Background': "un fondo {value}"
+        },
+        'other': "{type} {value}",
+        'wearing': ", vestido con {value}",
+        'wearing_only': "Este Boy lleva {value}.",
+        'and': " y ",
+        'openings': [
+            "Este Boy tiene {features}{wearing}.",
+            "Te presentamos a un Boy con {features}{wearing}.",
+            "Aquí está un Boy con {features}{wearing}."
+        ],
+        'tears': [
+            "Las lágrimas en sus mejillas muestran un corazón tierno que siente cada color con intensidad.",
+            "Llora con facilidad, porque siente con fuerza la belleza que lo rodea."
+        ],
+        'closings': [
+            "Ve el mundo como un lienzo y lo comparte con una sonrisa cálida.",
+            "Tierno y artístico, convierte los momentos tranquilos en algo hermoso.",
+            "Le encantan las conversaciones tranquilas sobre arte, emociones y las pequeñas cosas de la vida."
+        ],
+        'default': "Un personaje único con un alma tierna y espíritu artístico."
+    }
+}
+
+
+def phrase_language(language):
+    return 'es-ES' if (language or '').lower().startswith('es') else 'en-US'
+
+
+def pick(options, seed, salt):
+    return options[(seed + salt) % len(options)]
+
+
+def join_phrases(phrases, conjunction):
+    if len(phrases) <= 1:
+        return ''.join(phrases)
+    return ', '.join(phrases[:-1]) + conjunction + phrases[-1]
+
+
+def render_personality(traits, language='en-US'):
+    # traits: normalized [(trait_type, value), ...] as from personality.normalize_traits
+    table = PHRASES[phrase_language(language)]
+    present = [(trait_type, value) for trait_type, value in traits if value and value != 'None']
+    trait_map = dict(present)
+
+    features = []
+    ordered = sorted(present, key=lambda trait: FEATURE_ORDER.index(trait[0]) if trait[0] in FEATURE_ORDER else 99)
+    for trait_type, value in ordered:
+        if trait_type in ('Clothing', 'Tears'):
+            continue
+        template = table['features'].get(trait_type, table['other'])
+        features.append(template.format(value=value, type=trait_type.lower()))
+    clothing = trait_map.get('Clothing')
+    if not features and not clothing:
+        return table['default']
+
+    # Same traits, same wording: the variant is chosen from a stable hash
+    seed = int(hashlib.sha256(repr(present).encode('utf-8')).hexdigest()[:8], 16)
+    if features:
+        wearing = table['wearing'].format(value=clothing) if clothing else ''
+        opening = pick(table['openings'], seed, 0).format(
+            features=join_phrases(features, table['and']), wearing=wearing
+        )
+    else:
+        opening = table['wearing_only'].format(value=clothing)
+    sentences = [opening]
+    if trait_map.get('Tears') == 'Yes':
+        sentences.append(pick(table['tears'], seed, 1))
+    sentences.append(pick(table['closings'], seed, 2))
+    return ' '.join(sentences)
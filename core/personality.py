@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.clients import CLAUDE_TIMEOUT, within_deadline
+from core.concurrency import LLM_QUEUE_TIMEOUT, PERSONALITY_PRIORITY, PREFETCH_PRIORITY, Overloaded, llm_slots
+from core.deadline import time_left
+from core.logs import get_logger
+from core.metrics import registry, span, upstream_errors
+from core.persona import phrase_language, render_personality
+from core.personality_cache import personality_cache
+from core.singleflight import SingleFlight
+
+log = get_logger('personality')
+personality_lookups = registry.counter(
+    'nft_personality_lookups_total', 'Personality cache lookups by result', ('result',)
+)
+personality_polish = registry.counter(
+    'nft_personality_polish_total', 'Background Claude personality jobs by outcome', ('result',)
+)
+
+PERSONALITY_MODEL = os.getenv('PERSONALITY_MODEL', "claude-3-haiku-20240307")
+# Views show the template personality and ask Claude for its version in the background
+PERSONALITY_POLISH = os.getenv('PERSONALITY_POLISH', '1') == '1'
+PERSONALITY_POLISH_CONCURRENCY = int(os.getenv('PERSONALITY_POLISH_CONCURRENCY', 2))
+PERSONALITY_POLISH_MAX_PENDING = int(os.getenv('PERSONALITY_POLISH_MAX_PENDING', 256))
+DEFAULT_PERSONALITY = "A unique character with a gentle soul and artistic spirit."
+
+# The prompt deliberately leaves out the token id so every Boy with the same
+# traits shares one cached personality.
+PERSONALITY_PROMPT = """You are generating a personality for a Boy from the Boys collection.
+This NFT has the following specific traits:
+{trait_text}
+
+Create a personality description that EXACTLY matches these traits.
+Rules:
+1. ONLY mention traits that are listed above
+2. Use the EXACT values for each trait (e.g., if Hair Color is 'Blonde', don't say 'golden' or 'yellow')
+3. If a trait is not listed or is 'None', do not mention it at all
+4. Focus on the unique combination of:
+   - Hair Color: {hair_color}
+   - Face Add-ons: {face_addons}
+   - Eyes: {eyes}
+   - Clothing: {clothing}
+   - Tears: {tears}
+
+The description should be 2-3 sentences long and maintain a warm, artistic tone while being 100% accurate to the traits."""
+
+SPANISH_INSTRUCTION = "\nWrite the description in Spanish, keeping every trait value exactly as written above."
+
+# Viewers opening Boys with the same traits at once share one Claude call
+personality_flights = SingleFlight()
+
+polish_pool = ThreadPoolExecutor(max_workers=PERSONALITY_POLISH_CONCURRENCY, thread_name_prefix='personality-polish')
+_polishing = set()
+_polish_lock = threading.Lock()
+
+
+def get_traits(nft_data):
+    return (nft_data.get('extra_metadata') or {}).get('attributes') or []
+
+
+def normalize_traits(traits):
+    # Order-independent, whitespace-insensitive view of a trait list
+    normalized = {}
+    for trait in traits:
+        trait_type = str(trait.get('trait_type', '')).strip()
+        value = str(trait.get('value', '')).strip()
+        if trait_type:
+            normalized[trait_type] = value
+    return sorted(normalized.items())
+
+
+def build_personality_prompt(traits, language='en-US'):
+    trait_map = dict(traits)
+    trait_text = '\n'.join(f"{trait_type}: {value}" for trait_type, value in traits if value != 'None')
+    instruction = SPANISH_INSTRUCTION if language == 'es-ES' else ''
+    return PERSONALITY_PROMPT.format(
+        trait_text=trait_text,
+        hair_color=trait_map.get('Hair Color', 'None'),
+        face_addons=trait_map.get('Face Add-ons', 'None'),
+        eyes=trait_map.get('Eyes', 'None'),
+        clothing=trait_map.get('Clothing', 'None'),
+        tears=trait_map.get('Tears', 'None')
+    ) + instruction
+
+
+def personality_cache_key(traits, model, language='en-US'):
+    fields = {'traits': traits, 'prompt': PERSONALITY_PROMPT, 'model': model}
+    if language != 'en-US':
+        # Only added for other languages, so English keys (and shipped snapshots) stay valid
+        fields['language'] = language
+    payload = json.dumps(fields, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def generate_personality(claude, nft_data, model=PERSONALITY_MODEL, cache=personality_cache, language='en-US'):
+    # Waits for Claude on a miss; used by warmup and bundling
+    traits = normalize_traits(get_traits(nft_data))
+    cache_key = personality_cache_key(traits, model, language)
+    personality = cache.get(cache_key)
+    if personality is not None:
+        personality_lookups.inc('hit')
+        return personality
+    personality_lookups.inc('miss')
+    return personality_flights.do(
+        cache_key, lambda: request_personality(claude, nft_data, traits, cache_key, model, cache, language)
+    )
+
+
+def view_personality(claude, nft_data, language='en-US', model=PERSONALITY_MODEL, cache=personality_cache):
+    # Returns (text, source) without waiting on Claude: its cached version if
+    # there is one, otherwise the template while Claude's is made in the background
+    traits = normalize_traits(get_traits(nft_data))
+    language = phrase_language(language)
+    cache_key = personality_cache_key(traits, model, language)
+    personality = cache.get(cache_key)
+    if personality is not None:
+        personality_lookups.inc('hit')
+        return personality, 'claude'
+    personality_lookups.inc('miss')
+    if PERSONALITY_POLISH:
+        schedule_polish(claude, nft_data, traits, cache_key, model, cache, language)
+    return render_personality(traits, language), 'template'
+
+
+def schedule_polish(claude, nft_data, traits, cache_key, model, cache, language):
+    with _polish_lock:
+        if cache_key in _polishing:
+            return
+        if len(_polishing) >= PERSONALITY_POLISH_MAX_PENDING:
+            personality_polish.inc('dropped')  # a later view schedules it again
+            return
+        _polishing.add(cache_key)
+    personality_polish.inc('scheduled')
+    polish_pool.submit(polish, claude, nft_data, traits, cache_key, model, cache, language)
+
+
+def polish(claude, nft_data, traits, cache_key, model, cache, language):
+    try:
+        personality = personality_flights.do(
+            cache_key, lambda: request_personality(claude, nft_data, traits, cache_key, model, cache, language)
+        )
+        personality_polish.inc('failed' if personality == DEFAULT_PERSONALITY else 'generated')
+    except Overloaded:
+        personality_polish.inc('overloaded')
+    finally:
+        with _polish_lock:
+            _polishing.discard(cache_key)
+
+
+def prefetch_personality(claude, nft_data, language='en-US', model=PERSONALITY_MODEL, cache=personality_cache):
+    # Claude's personality ahead of a likely view, queued behind every other
+    # Claude call: 'cached', 'generated' or 'failed'. Raises Overloaded.
+    traits = normalize_traits(get_traits(nft_data))
+    language = phrase_language(language)
+    cache_key = personality_cache_key(traits, model, language)
+    if cache.get(cache_key) is not None:
+        return 'cached'
+    personality = personality_flights.do(cache_key, lambda: request_personality(
+        claude, nft_data, traits, cache_key, model, cache, language, priority=PREFETCH_PRIORITY
+    ))
+    return 'failed' if personality == DEFAULT_PERSONALITY else 'generated'
+
+
+def polish_stats():
+    with _polish_lock:
+        return {'pending': len(_polishing)}
+
+
+def request_personality(claude, nft_data, traits, cache_key, model, cache, language='en-US',
+                        priority=PERSONALITY_PRIORITY):
+    # A flight that just finished may have filled the cache after our lookup
+    personality = cache.get(cache_key)
+    if personality is not None:
+        return personality
+
+    # The slot wait and the call itself both fit in what is left of the request's deadline
+    slot_wait = time_left(LLM_QUEUE_TIMEOUT)
+    try:
+        with llm_slots.slot(priority, slot_wait), span('claude_personality'):
+            message = within_deadline(claude).messages.create(
+                timeout=time_left(CLAUDE_TIMEOUT),
+                model=model,
+                max_tokens=150,
+                temperature=0.7,
+                messages=[{
+                    "role": "user",
+                    "content": build_personality_prompt(traits, language)
+                }]
+            )
+        personality = message.content[0].text
+    except Overloaded as e:
+        if e.reason == 'queue_timeout' and slot_wait < LLM_QUEUE_TIMEOUT:
+            # Still queued when the request's deadline ran out
+            log.warning("No Claude slot before the deadline", extra={'token_id': nft_data.get('token_id')})
+            return DEFAULT_PERSONALITY
+        # Saturated: the caller answers 503 rather than waiting or serving the fallback
+        raise
+    except Exception as e:
+        upstream_errors.inc('claude', type(e).__name__)
+        log.warning("Error generating personality", extra={'token_id': nft_data.get('token_id'), 'error': str(e)})
+        return DEFAULT_PERSONALITY
+
+    cache.set(cache_key, personality, model)
+    log.info("Generated personality", extra={'token_id': nft_data.get('token_id')})
+    return personality
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from core.db import CACHE_DIR, DATA_DIR, connect_sqlite
+
+PERSONALITY_CACHE_PATH = os.getenv('PERSONALITY_CACHE_PATH', os.path.join(CACHE_DIR, 'personalities.sqlite3'))
+PERSONALITY_CACHE_MAX_BYTES = int(os.getenv('PERSONALITY_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+PERSONALITY_CACHE_MEMORY_ENTRIES = int(os.getenv('PERSONALITY_CACHE_MEMORY_ENTRIES', 4096))
+# Precomputed personalities written by `python -m core.warmup`, loaded at startup
+PERSONALITY_SNAPSHOT_PATH = os.getenv('PERSONALITY_SNAPSHOT_PATH', os.path.join(DATA_DIR, 'personalities.json'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS personalities (
+    key TEXT PRIMARY KEY,
+    personality TEXT NOT NULL,
+    model TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS personalities_accessed_at ON personalities (accessed_at);
+"""
+
+
+class PersonalityCache:
+    """Disk-backed LRU cache of generated personalities with an in-memory front."""
+
+    def __init__(self, path=PERSONALITY_CACHE_PATH, max_bytes=PERSONALITY_CACHE_MAX_BYTES,
+                 memory_entries=PERSONALITY_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        # Access times of memory hits, written back lazily so hits never touch disk
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._db = connect_sqlite(path)
+        self._db.executescript(SCHEMA)
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM personalities").fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            personality = self._memory.get(key)
+            if personality is not None:
+                self._memory.move_to_end(key)
+                self._touched[key] = time.time()
+                return personality
+
+            row = self._db.execute("SELECT personality FROM personalities WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE personalities SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._remember(key, row[0])
+            return row[0]
+
+    def set(self, key, personality, model=None):
+        size = len(key) + len(personality.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute("SELECT size FROM personalities WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO personalities (key, personality, model, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, personality, model, size, now, now)
+            )
+            self._size += size - (previous[0] if previous else 0)
+            self._remember(key, personality)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def load_snapshot(self, path=PERSONALITY_SNAPSHOT_PATH):
+        # Entries already in the cache win; returns how many were added
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            snapshot = json.load(f)
+        model = snapshot.get('model')
+        now = time.time()
+        rows = [
+            (key, personality, model, len(key) + len(personality.encode('utf-8')), now, now)
+            for key, personality in snapshot.get('personalities', {}).items()
+        ]
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                "INSERT OR IGNORE INTO personalities (key, personality, model, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            added = self._db.total_changes - before
+            self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM personalities").fetchone()[0]
+            if self._size > self.max_bytes:
+                self._evict()
+        return added
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM personalities").fetchone()[0]
+            return {'entries': count, 'bytes': self._size, 'memory_entries': len(self._memory)}
+
+    def _remember(self, key, personality):
+        self._memory[key] = personality
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "UPDATE personalities SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self):
+        # Evict least recently used rows until we are comfortably under budget
+        self._flush_touched()
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute("SELECT key, size FROM personalities ORDER BY accessed_at").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            evicted.append((key,))
+            self._size -= size
+            self._memory.pop(key, None)
+        self._db.executemany("DELETE FROM personalities WHERE key = ?", evicted)
+
+
+personality_cache = PersonalityCache()
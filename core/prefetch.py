@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from core.concurrency import Overloaded
+from core.deadline import REQUEST_DEADLINE, DeadlineExceeded, deadline
+from core.logs import get_logger
+
+# Speculative work for the views a visitor is likely to open next: the
+# tokens around the one just viewed and the rest of the collection grid.
+# Jobs wait in a bounded queue, newest first, and only run while few API
+# requests are in flight. A visitor's next page view cancels whatever is
+# still queued for their previous one.
+
+PREFETCH = os.getenv('PREFETCH', '1') == '1'
+PREFETCH_NEIGHBORS = int(os.getenv('PREFETCH_NEIGHBORS', 2))  # token ids on each side of a viewed token
+PREFETCH_PER_VIEW = int(os.getenv('PREFETCH_PER_VIEW', 12))
+PREFETCH_MAX_PENDING = int(os.getenv('PREFETCH_MAX_PENDING', 64))
+PREFETCH_CONCURRENCY = int(os.getenv('PREFETCH_CONCURRENCY', 1))
+# Jobs wait while this many API requests are in flight
+PREFETCH_BUSY_REQUESTS = int(os.getenv('PREFETCH_BUSY_REQUESTS', 2))
+# Queued longer than this, a job is dropped: the visitor has moved on
+PREFETCH_MAX_AGE = float(os.getenv('PREFETCH_MAX_AGE', 30))
+
+# Finished prefetches are taken to still be warm (or missing) for this long and not redone
+PREFETCH_REMEMBER = 600
+PREFETCH_TRACKED = 4096
+
+# How a queued job ended
+PREFETCH_RESULTS = ('superseded', 'cancelled', 'dropped', 'expired', 'warm', 'completed', 'failed', 'overloaded')
+
+log = get_logger('prefetch')
+
+
+class PrefetchJob:
+    __slots__ = ('key', 'origin', 'run', 'queued_at')
+
+    def __init__(self, key, origin, run):
+        # run(key) does the work
+        self.key = key
+        self.origin = origin
+        self.run = run
+        self.queued_at = time.monotonic()
+
+
+class Prefetcher:
+    """Bounded, cancellable queue of background jobs that runs only while the server is nearly idle.
+
+    Jobs are keyed by what they warm (a token). run(key) returns 'completed',
+    'warm' when everything was cached already, or 'failed'. Views of a key
+    are reported with viewed() to measure how many of them found it warm.
+    A finished or failed key is not scheduled again for PREFETCH_REMEMBER seconds.
+    """
+
+    def __init__(self, workers=PREFETCH_CONCURRENCY, max_pending=PREFETCH_MAX_PENDING,
+                 busy_requests=PREFETCH_BUSY_REQUESTS, max_age=PREFETCH_MAX_AGE, job_deadline=REQUEST_DEADLINE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.busy_requests = busy_requests
+        self.max_age = max_age
+        self.job_deadline = job_deadline
+        self._queue = OrderedDict()  # key -> job, next to run first
+        self._running = set()
+        self._done = OrderedDict()  # key -> [finished_at, result, viewed], oldest first
+        self._active = 0
+        self._threads = []
+        self._cond = threading.Condition()
+        self.counts = dict.fromkeys(('scheduled',) + PREFETCH_RESULTS + ('hits', 'late', 'misses', 'used'), 0)
+
+    @contextmanager
+    def foreground(self):
+        # Wraps every API request; jobs wait while too many are in flight
+        with self._cond:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                if self._active < self.busy_requests:
+                    self._cond.notify_all()
+
+    def schedule(self, origin, keys, run):
+        # keys: most likely first. They replace what `origin` (a client)
+        # still has queued, and go ahead of everyone else's.
+        with self._cond:
+            if self._queue:
+                stale = [key for key, job in self._queue.items() if job.origin == origin and key not in keys]
+                for key in stale:
+                    del self._queue[key]
+                self.counts['superseded'] += len(stale)
+            self._forget()
+            for key in reversed(keys):
+                if key in self._running or key in self._done:
+                    continue
+                if key not in self._queue:
+                    self.counts['scheduled'] += 1
+                self._queue[key] = PrefetchJob(key, origin, run)
+                self._queue.move_to_end(key, last=False)
+            while len(self._queue) > self.max_pending:
+                self._queue.popitem()  # the oldest batch's least likely job
+                self.counts['dropped'] += 1
+            self._start_workers()
+            self._cond.notify_all()
+
+    def viewed(self, key):
+        # A real request for `key`: a hit if its prefetch finished, and a
+        # queued prefetch is cancelled since the request does the work itself
+        with self._cond:
+            self._forget()
+            done = self._done.get(key)
+            if done is not None and done[1] != 'failed':
+                self.counts['hits'] += 1
+                if not done[2]:
+                    done[2] = True
+                    self.counts['used'] += 1
+            elif key in self._running:
+                self.counts['late'] += 1
+            elif self._queue.pop(key, None) is not None:
+                self.counts['late'] += 1
+                self.counts['cancelled'] += 1
+            else:
+                self.counts['misses'] += 1
+
+    def stats(self):
+        with self._cond:
+            views = self.counts['hits'] + self.counts['late'] + self.counts['misses']
+            finished = self.counts['completed'] + self.counts['warm']
+            return dict(
+                self.counts,
+                pending=len(self._queue),
+                running=len(self._running),
+                # Views that found their token prefetched, and prefetches that were then viewed
+                hit_ratio=round(self.counts['hits'] / views, 4) if views else 0.0,
+                precision=round(self.counts['used'] / finished, 4) if finished else 0.0
+            )
+
+    def _forget(self):
+        # Caller holds the lock
+        cutoff = time.monotonic() - PREFETCH_REMEMBER
+        while self._done and (len(self._done) > PREFETCH_TRACKED or next(iter(self._done.values()))[0] < cutoff):
+            self._done.popitem(last=False)
+
+    def _start_workers(self):
+        # Caller holds the lock; threads start with the first scheduled job
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f'prefetch-{len(self._threads)}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                while not self._queue or self._active >= self.busy_requests:
+                    self._cond.wait()
+                _, job = self._queue.popitem(last=False)
+                if time.monotonic() - job.queued_at > self.max_age:
+                    self.counts['expired'] += 1
+                    continue
+                self._running.add(job.key)
+                return job
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            result = 'failed'
+            try:
+                with deadline(self.job_deadline):
+                    result = job.run(job.key)
+            except Overloaded:
+                result = 'overloaded'  # real Claude work is waiting
+            except DeadlineExceeded:
+                pass
+            except Exception as e:
+                log.warning("Prefetch failed", extra={'key': job.key, 'error': str(e)})
+            with self._cond:
+                self._running.discard(job.key)
+                self.counts[result] += 1
+                if result != 'overloaded':
+                    # Failures are remembered too, so a token that doesn't exist isn't fetched on every view
+                    self._done.pop(job.key, None)
+                    self._done[job.key] = [time.monotonic(), result, False]
+
+
+def neighbor_ids(token_id, count=PREFETCH_NEIGHBORS):
+    # '7' -> ['8', '6', '9', '5'], nearest first; nothing for non-numeric ids
+    if not token_id.isdigit():
+        return []
+    number = int(token_id)
+    ids = []
+    for distance in range(1, count + 1):
+        ids.append(str(number + distance))
+        if number - distance >= 0:
+            ids.append(str(number - distance))
+    return ids
+
+
+def grid_after(token_ids, token_id):
+    # The grid in order, starting after `token_id` and wrapping around
+    if token_id in token_ids:
+        index = token_ids.index(token_id)
+        return token_ids[index + 1:] + token_ids[:index]
+    return list(token_ids)
+
+
+prefetcher = Prefetcher()
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        # Returns 0 when the tokens were taken, otherwise the seconds until they would be available
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class ClientRateLimiter:
+    """One TokenBucket per client, forgetting the least recently seen clients beyond max_clients."""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.limited = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check(self, client):
+        # Returns 0 when the request may go ahead, otherwise the seconds to wait
+        if self.rate <= 0 or not client:
+            return 0
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+        wait = bucket.try_acquire()
+        if wait:
+            with self._lock:
+                self.limited += 1
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._buckets), 'limited': self.limited, 'rate': self.rate, 'burst': self.burst}
+
+
+# Requests per second (and burst) each client IP may make to /api/; 0 disables
+client_limiter = ClientRateLimiter(
+    float(os.getenv('CLIENT_RATE_LIMIT', 10)), float(os.getenv('CLIENT_RATE_BURST', 40))
+)
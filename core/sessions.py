@@ -0,0 +1,77 @@
+import os
+import secrets
+import threading
+from collections import deque
+from core.ttl_cache import TTLCache
+
+CHAT_SESSION_TTL = int(os.getenv('CHAT_SESSION_TTL', 1800))
+CHAT_SESSION_MAX = int(os.getenv('CHAT_SESSION_MAX', 10000))
+# Ring buffer size in turns (one user message plus one reply)
+CHAT_HISTORY_TURNS = int(os.getenv('CHAT_HISTORY_TURNS', 20))
+# Approximate input tokens of history sent with each turn
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 1500))
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting English/Spanish chat
+    return len(text) // 4 + 1
+
+
+class ChatSession:
+    def __init__(self, nft_id, language, system_prompt):
+        self.id = secrets.token_urlsafe(16)
+        self.nft_id = nft_id
+        self.language = language
+        # Built once per session; the persona never changes mid-conversation
+        self.system = system_prompt
+        self.turns = deque(maxlen=CHAT_HISTORY_TURNS)
+        self.lock = threading.Lock()
+
+    def messages(self, user_input, token_budget=CHAT_HISTORY_TOKEN_BUDGET):
+        # Newest turns first until the budget is spent, then back in order
+        with self.lock:
+            turns = list(self.turns)
+        kept = []
+        spent = estimate_tokens(user_input)
+        for user_text, reply in reversed(turns):
+            cost = estimate_tokens(user_text) + estimate_tokens(reply)
+            if spent + cost > token_budget:
+                break
+            kept.append((user_text, reply))
+            spent += cost
+        kept.reverse()
+
+        messages = []
+        for user_text, reply in kept:
+            messages.append({"role": "user", "content": user_text})
+            messages.append({"role": "assistant", "content": reply})
+        messages.append({"role": "user", "content": user_input})
+        return messages
+
+    def record(self, user_input, reply):
+        with self.lock:
+            self.turns.append((user_input, reply))
+
+
+class SessionStore:
+    def __init__(self, ttl=CHAT_SESSION_TTL, max_sessions=CHAT_SESSION_MAX):
+        self._sessions = TTLCache('chat_session', ttl=ttl, max_entries=max_sessions)
+
+    def get(self, session_id, nft_id, language):
+        # A session only continues with the same Boy in the same language
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None or session.nft_id != nft_id or session.language != language:
+            return None
+        self._sessions.set(session.id, session)  # Sliding expiry
+        return session
+
+    def create(self, nft_id, language, system_prompt):
+        session = ChatSession(nft_id, language, system_prompt)
+        self._sessions.set(session.id, session)
+        return session
+
+    def stats(self):
+        return self._sessions.stats()
+
+
+chat_sessions = SessionStore()
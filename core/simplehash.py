@@ -0,0 +1,187 @@
+import os
+import random
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from core.concurrency import upstream_slots
+from core.deadline import DeadlineExceeded, time_left
+from core.logs import get_logger
+from core.metrics import span, upstream_errors
+from core.ratelimit import TokenBucket
+from core.startup import lazy_import
+
+SIMPLEHASH_BASE_URL = os.getenv('SIMPLEHASH_BASE_URL', 'https://api.simplehash.com/api/v0')
+SIMPLEHASH_CONNECT_TIMEOUT = float(os.getenv('SIMPLEHASH_CONNECT_TIMEOUT', 3.05))
+SIMPLEHASH_READ_TIMEOUT = float(os.getenv('SIMPLEHASH_READ_TIMEOUT', 10))
+SIMPLEHASH_MAX_RETRIES = int(os.getenv('SIMPLEHASH_MAX_RETRIES', 3))
+SIMPLEHASH_BACKOFF_BASE = float(os.getenv('SIMPLEHASH_BACKOFF_BASE', 0.25))
+SIMPLEHASH_BACKOFF_MAX = float(os.getenv('SIMPLEHASH_BACKOFF_MAX', 8))
+# Longest Retry-After we are willing to sleep through inside a request
+SIMPLEHASH_MAX_RETRY_AFTER = float(os.getenv('SIMPLEHASH_MAX_RETRY_AFTER', 10))
+# Client-side quota: sustained requests per second and burst size
+SIMPLEHASH_RATE_LIMIT = float(os.getenv('SIMPLEHASH_RATE_LIMIT', 10))
+SIMPLEHASH_BURST = int(os.getenv('SIMPLEHASH_BURST', 20))
+SIMPLEHASH_RATE_LIMIT_WAIT = float(os.getenv('SIMPLEHASH_RATE_LIMIT_WAIT', 5))
+SIMPLEHASH_POOL_SIZE = int(os.getenv('SIMPLEHASH_POOL_SIZE', 32))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+log = get_logger('simplehash')
+# Most nft_ids SimpleHash accepts in one /nfts/assets call
+SIMPLEHASH_ASSETS_BATCH_SIZE = 50
+
+
+@contextmanager
+def upstream_slot():
+    # Waits for one of the shared SimpleHash slots no longer than the request has left
+    if not upstream_slots.acquire(timeout=time_left()):
+        raise DeadlineExceeded("No SimpleHash slot before the deadline")
+    try:
+        yield
+    finally:
+        upstream_slots.release()
+
+
+class SimpleHashError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def collection_info(nfts):
+    # Collection-level fields as returned by /api/collection
+    collection_data = nfts[0].get('collection') or {}
+    return {
+        'collection_id': collection_data.get('collection_id'),
+        'name': collection_data.get('name'),
+        'description': collection_data.get('description'),
+        'image_url': collection_data.get('image_url'),
+        'banner_image_url': collection_data.get('banner_image_url'),
+        'category': collection_data.get('category'),
+        'external_url': collection_data.get('external_url'),
+        'twitter_username': collection_data.get('twitter_username'),
+        'discord_url': collection_data.get('discord_url'),
+        'floor_prices': collection_data.get('floor_prices', []),
+        'distinct_owner_count': collection_data.get('distinct_owner_count'),
+        'distinct_nft_count': collection_data.get('distinct_nft_count'),
+        'total_quantity': collection_data.get('total_quantity'),
+        'nfts': nfts
+    }
+
+
+def retry_after_seconds(response):
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class SimpleHashClient:
+    """Shared, keep-alive SimpleHash client with retries and a client-side rate limit."""
+
+    def __init__(self, api_key, base_url=SIMPLEHASH_BASE_URL, pool_size=SIMPLEHASH_POOL_SIZE,
+                 rate_limit=SIMPLEHASH_RATE_LIMIT, burst=SIMPLEHASH_BURST):
+        self.base_url = base_url.rstrip('/')
+        self.bucket = TokenBucket(rate_limit, burst)
+        # requests is only imported once a client is actually built
+        self.requests = lazy_import('requests')
+        self.session = self.requests.Session()
+        adapter = self.requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "X-API-KEY": api_key or ""
+        })
+
+    def backoff(self, attempt):
+        # Full jitter keeps a burst of retries from landing at the same moment
+        return random.uniform(0, min(SIMPLEHASH_BACKOFF_MAX, SIMPLEHASH_BACKOFF_BASE * (2 ** attempt)))
+
+    def sleep_before_retry(self, delay):
+        left = time_left()
+        if left is not None and delay >= left:
+            raise DeadlineExceeded("No time left to retry SimpleHash")
+        time.sleep(delay)
+
+    def get(self, path, params=None):
+        # Timeouts, rate limit waits and retries all fit inside the request's deadline, if it has one
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(SIMPLEHASH_MAX_RETRIES + 1):
+            if not self.bucket.acquire(timeout=time_left(SIMPLEHASH_RATE_LIMIT_WAIT)):
+                upstream_errors.inc('simplehash', 'rate_limited')
+                raise SimpleHashError("SimpleHash client-side rate limit exceeded", 429)
+
+            last_attempt = attempt == SIMPLEHASH_MAX_RETRIES
+            try:
+                with upstream_slot(), span('simplehash'):
+                    # Sized after the wait for a slot
+                    read_timeout = time_left(SIMPLEHASH_READ_TIMEOUT)
+                    response = self.session.get(
+                        url, params=params, timeout=(min(SIMPLEHASH_CONNECT_TIMEOUT, read_timeout), read_timeout)
+                    )
+            except (self.requests.exceptions.ConnectionError, self.requests.exceptions.Timeout) as e:
+                upstream_errors.inc('simplehash', type(e).__name__)
+                if last_attempt:
+                    raise
+                self.sleep_before_retry(self.backoff(attempt))
+                continue
+
+            if response.status_code >= 500 or response.status_code == 429:
+                upstream_errors.inc('simplehash', str(response.status_code))
+            if response.status_code not in RETRY_STATUSES or last_attempt:
+                return response
+
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = self.backoff(attempt)
+            elif delay > SIMPLEHASH_MAX_RETRY_AFTER:
+                # Not worth holding the request open; let the caller degrade
+                return response
+            log.info("Retrying SimpleHash request", extra={
+                'status': response.status_code, 'path': path, 'delay': round(delay, 2)
+            })
+            # Raises DeadlineExceeded rather than report a retryable failure as the answer
+            self.sleep_before_retry(delay)
+
+    def get_json(self, path, params=None):
+        response = self.get(path, params=params)
+        if response.status_code == 404:
+            return None
+        if not response.ok:
+            raise SimpleHashError(f"SimpleHash returned {response.status_code} for {path}", response.status_code)
+        return response.json()
+
+    def collection_nfts(self, chain, contract_address, limit=None, cursor=None):
+        params = {"order_by": "token_id"}
+        if limit:
+            params["limit"] = limit
+        if cursor:
+            params["cursor"] = cursor
+        return self.get_json(f"nfts/{chain}/{contract_address}", params=params)
+
+    def nft(self, chain, contract_address, token_id):
+        return self.get_json(f"nfts/{chain}/{contract_address}/{token_id}")
+
+    def nfts_by_ids(self, chain, contract_address, token_ids):
+        nft_ids = ','.join(f"{chain}.{contract_address}.{token_id}" for token_id in token_ids)
+        data = self.get_json("nfts/assets", params={"nft_ids": nft_ids})
+        return (data or {}).get('nfts') or []
+
+    def iter_collection_pages(self, chain, contract_address, cursor=None, page_size=50):
+        # Walks SimpleHash cursor pagination, yielding (nfts, next_cursor) per page
+        while True:
+            data = self.collection_nfts(chain, contract_address, limit=page_size, cursor=cursor)
+            if not data:
+                return
+            cursor = data.get('next_cursor')
+            yield data.get('nfts') or [], cursor
+            if not cursor:
+                return
@@ -0,0 +1,54 @@
+import threading
+from core.deadline import DeadlineExceeded, time_left
+
+
+class Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            # Share the leader's outcome, including its exception, unless our own deadline passes first
+            if not call.done.wait(time_left()):
+                raise DeadlineExceeded("Deadline exceeded waiting for a coalesced call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {'executed': self.executed, 'coalesced': self.coalesced, 'in_flight': len(self._calls)}
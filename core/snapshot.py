@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from core.db import CACHE_DIR, DATA_DIR, connect_sqlite, connect_sqlite_readonly
+from core.simplehash import collection_info
+
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', os.path.join(CACHE_DIR, 'snapshot.sqlite3'))
+# Read-only snapshot shipped with the deploy, consulted when the local one has nothing
+BUNDLED_SNAPSHOT_PATH = os.getenv('BUNDLED_SNAPSHOT_PATH', os.path.join(DATA_DIR, 'snapshot.sqlite3'))
+# Tokens returned with /api/collection, matching the live SimpleHash page size
+COLLECTION_PREVIEW_SIZE = 12
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    chain TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    info BLOB,
+    next_cursor TEXT,
+    complete INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (chain, contract)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS nfts (
+    chain TEXT NOT NULL,
+    contract TEXT NOT NULL,
+    token_id TEXT NOT NULL,
+    token_order INTEGER,
+    data BLOB NOT NULL,
+    digest TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (chain, contract, token_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS nfts_order ON nfts (chain, contract, token_order, token_id);
+"""
+
+
+def pack(value):
+    return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+def token_order(token_id):
+    try:
+        return int(token_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class SnapshotStore:
+    """Compact local copy of whole collections, filled by ingest_collection.
+
+    Collections and tokens are only served once their ingest has finished.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, bundle_path=BUNDLED_SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = connect_sqlite(path)
+        self._db.executescript(SCHEMA)
+        self._bundle = None
+        if bundle_path and bundle_path != path and os.path.exists(bundle_path):
+            self._bundle = connect_sqlite_readonly(bundle_path)
+
+    def _read(self, query, params, fetch_all=False):
+        # Local rows win; the bundled snapshot only fills gaps
+        with self._lock:
+            for db in (self._db, self._bundle):
+                if db is None:
+                    continue
+                cursor = db.execute(query, params)
+                result = cursor.fetchall() if fetch_all else cursor.fetchone()
+                if result:
+                    return result
+        return [] if fetch_all else None
+
+    def state(self, chain, contract_address):
+        row = self._read(
+            "SELECT next_cursor, complete, updated_at FROM collections WHERE chain = ? AND contract = ?",
+            (chain, contract_address.lower())
+        )
+        if row is None:
+            return None
+        return {'next_cursor': row[0], 'complete': bool(row[1]), 'updated_at': row[2]}
+
+    def is_complete(self, chain, contract_address):
+        # Only a finished ingest has every token; live fetches also add single rows
+        state = self.state(chain, contract_address)
+        return bool(state and state['complete'])
+
+    def get_collection(self, chain, contract_address):
+        contract_address = contract_address.lower()
+        row = self._read(
+            "SELECT info FROM collections WHERE chain = ? AND contract = ? AND info IS NOT NULL AND complete = 1",
+            (chain, contract_address)
+        )
+        if row is None:
+            return None
+        preview = self._read(
+            "SELECT data FROM nfts WHERE chain = ? AND contract = ? ORDER BY token_order, token_id LIMIT ?",
+            (chain, contract_address, COLLECTION_PREVIEW_SIZE),
+            fetch_all=True
+        )
+        info = unpack(row[0])
+        info['nfts'] = [unpack(data) for (data,) in preview]
+        return info
+
+    def get_nft(self, chain, contract_address, token_id):
+        row = self._read(
+            "SELECT data FROM nfts WHERE chain = ? AND contract = ? AND token_id = ? AND EXISTS ("
+            "SELECT 1 FROM collections WHERE collections.chain = nfts.chain "
+            "AND collections.contract = nfts.contract AND complete = 1)",
+            (chain, contract_address.lower(), str(token_id))
+        )
+        return unpack(row[0]) if row else None
+
+    def iter_nfts(self, chain, contract_address, batch_size=500):
+        # Keyset pagination so callers can stream a large collection without holding the lock
+        contract_address = contract_address.lower()
+        last = (-1, '')
+        while True:
+            rows = self._read(
+                "SELECT token_order, token_id, data FROM nfts WHERE chain = ? AND contract = ? "
+                "AND (COALESCE(token_order, -1), token_id) > (?, ?) "
+                "ORDER BY COALESCE(token_order, -1), token_id LIMIT ?",
+                (chain, contract_address, last[0], last[1], batch_size),
+                fetch_all=True
+            )
+            if not rows:
+                return
+            for order, token_id, data in rows:
+                yield unpack(data)
+            order, token_id, _ = rows[-1]
+            last = (-1 if order is None else order, token_id)
+
+    def put_page(self, chain, contract_address, nfts, next_cursor, complete=False):
+        # One transaction per page: the stored cursor always matches the stored rows
+        contract_address = contract_address.lower()
+        now = time.time()
+        info = None
+        if nfts:
+            info = collection_info(nfts)
+            del info['nfts']
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                changed = self._upsert_nfts(chain, contract_address, nfts, now)
+                self._db.execute(
+                    "INSERT INTO collections (chain, contract, info, next_cursor, complete, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (chain, contract) DO UPDATE SET "
+                    "info = COALESCE(excluded.info, info), next_cursor = excluded.next_cursor, "
+                    "complete = excluded.complete, updated_at = excluded.updated_at",
+                    (chain, contract_address, pack(info) if info else None, next_cursor, int(complete), now)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return changed
+
+    def _upsert_nfts(self, chain, contract_address, nfts, now):
+        changed = 0
+        for nft in nfts:
+            token_id = str(nft.get('token_id'))
+            data = pack(nft)
+            digest = hashlib.sha1(data).hexdigest()
+            row = self._db.execute(
+                "SELECT digest FROM nfts WHERE chain = ? AND contract = ? AND token_id = ?",
+                (chain, contract_address, token_id)
+            ).fetchone()
+            if row and row[0] == digest:
+                continue
+            self._db.execute(
+                "INSERT OR REPLACE INTO nfts (chain, contract, token_id, token_order, data, digest, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (chain, contract_address, token_id, token_order(token_id), data, digest, now)
+            )
+            changed += 1
+        return changed
+
+
+def ingest_collection(store, client, chain, contract_address, refresh=False, page_size=50):
+    # Resumes an interrupted ingest from its saved cursor. With refresh=True a
+    # finished collection is walked again and only changed tokens are rewritten.
+    state = store.state(chain, contract_address)
+    cursor = None
+    if state and not state['complete'] and state['next_cursor']:
+        cursor = state['next_cursor']
+    elif state and state['complete'] and not refresh:
+        return {'pages': 0, 'nfts': 0, 'changed': 0, 'complete': True}
+
+    summary = {'pages': 0, 'nfts': 0, 'changed': 0, 'complete': False}
+    for nfts, next_cursor in client.iter_collection_pages(chain, contract_address, cursor=cursor, page_size=page_size):
+        summary['changed'] += store.put_page(chain, contract_address, nfts, next_cursor, complete=not next_cursor)
+        summary['pages'] += 1
+        summary['nfts'] += len(nfts)
+        summary['complete'] = not next_cursor
+        print(f"Ingested page {summary['pages']} ({summary['nfts']} NFTs, {summary['changed']} changed)")
+    return summary
+
+
+snapshot_store = SnapshotStore()
+
+
+def main():
+    from core.simplehash import SimpleHashClient
+
+    parser = argparse.ArgumentParser(description="Ingest a whole collection into the local snapshot store")
+    parser.add_argument('chain')
+    parser.add_argument('contract')
+    parser.add_argument('--refresh', action='store_true', help="re-walk a finished collection and update changed tokens")
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--path', default=SNAPSHOT_PATH, help="snapshot database path")
+    args = parser.parse_args()
+
+    store = snapshot_store if args.path == SNAPSHOT_PATH else SnapshotStore(args.path)
+    client = SimpleHashClient(os.getenv('SIMPLEHASH_API_KEY'))
+    summary = ingest_collection(store, client, args.chain, args.contract, refresh=args.refresh, page_size=args.page_size)
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Imported first by each entry point, so this approximates process start
+PROCESS_START = time.perf_counter()
+
+timings = {}
+first_response_ms = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def lazy_import(name):
+    # Heavy dependencies are imported on first use; the cost lands in the report
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with timed(f"import {name}"):
+        return importlib.import_module(name)
+
+
+def mark_response():
+    global first_response_ms
+    if first_response_ms is None:
+        with _lock:
+            if first_response_ms is None:
+                first_response_ms = round((time.perf_counter() - PROCESS_START) * 1000, 2)
+                return True
+    return False
+
+
+def startup_report():
+    with _lock:
+        return {
+            'timings_ms': dict(timings),
+            'time_to_first_response_ms': first_response_ms,
+            'uptime_s': round(time.perf_counter() - PROCESS_START, 2)
+        }
@@ -0,0 +1,147 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+import time
+from core.http_cache import brotli, is_compressible
+
+# Static files are read, hashed and precompressed once at startup, so serving
+# them costs no disk reads or compression per request. Large binary files
+# (images) stay on disk and are sent with socket.sendfile.
+
+STATIC_SENDFILE_MIN_BYTES = int(os.getenv('STATIC_SENDFILE_MIN_BYTES', 64 * 1024))
+# Poll src/ for changes and reload; meant for local development
+STATIC_RELOAD = os.getenv('STATIC_RELOAD', '0') == '1'
+STATIC_RELOAD_INTERVAL = float(os.getenv('STATIC_RELOAD_INTERVAL', 1.0))
+HASH_LENGTH = 8
+
+# src="app.js" / href="styles.css" references rewritten to hashed URLs
+ASSET_REFERENCE = re.compile(r'(?P<attr>(?:src|href)=")(?P<url>[^"?#:]+)"')
+
+
+def hashed_name(url_path, digest):
+    root, ext = posixpath.splitext(url_path)
+    return f"{root}.{digest[:HASH_LENGTH]}{ext}"
+
+
+class StaticAsset:
+    def __init__(self, url_path, file_path, content_type, digest, size, body=None):
+        self.url_path = url_path
+        self.file_path = file_path
+        self.content_type = content_type
+        self.digest = digest
+        self.size = size
+        self.hashed_path = hashed_name(url_path, digest)
+        # body is None for files served from disk with sendfile
+        self.body = body
+        self.variants = {}
+
+    def precompress(self):
+        self.variants = {}
+        if self.body is None or not is_compressible(self.content_type):
+            return
+        compressed = gzip.compress(self.body, compresslevel=9, mtime=0)
+        if len(compressed) < len(self.body):
+            self.variants['gzip'] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(self.body, quality=11)
+            if len(compressed) < len(self.body):
+                self.variants['br'] = compressed
+
+    def etag(self, encoding=None):
+        return f'"{self.digest[:32]}-{encoding}"' if encoding else f'"{self.digest[:32]}"'
+
+
+class StaticAssets:
+    def __init__(self, root, reload=STATIC_RELOAD):
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self._assets = {}
+        self._signature = None
+        self.stats = {'loads': 0, 'reloads': 0}
+        self.load()
+        if reload:
+            threading.Thread(target=self._watch, name='static-reload', daemon=True).start()
+
+    def _scan(self):
+        files = {}
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                file_path = os.path.join(directory, name)
+                stat = os.stat(file_path)
+                files[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def load(self):
+        signature = self._scan()
+        assets = {}
+        for file_path in signature:
+            url_path = '/' + os.path.relpath(file_path, self.root).replace(os.sep, '/')
+            content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+            size = signature[file_path][1]
+            sha = hashlib.sha256()
+            body = None
+            with open(file_path, 'rb') as f:
+                if size < STATIC_SENDFILE_MIN_BYTES or is_compressible(content_type):
+                    body = f.read()
+                    sha.update(body)
+                else:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        sha.update(chunk)
+            assets[url_path] = StaticAsset(url_path, file_path, content_type, sha.hexdigest(), size, body)
+
+        # Pages point at hashed URLs, so their own hash covers the assets they use
+        for asset in assets.values():
+            if asset.content_type == 'text/html':
+                asset.body = self._rewrite_references(asset, assets)
+                asset.size = len(asset.body)
+                asset.digest = hashlib.sha256(asset.body).hexdigest()
+                asset.hashed_path = hashed_name(asset.url_path, asset.digest)
+        for asset in assets.values():
+            asset.precompress()
+
+        routes = {}
+        for asset in assets.values():
+            routes[asset.url_path] = asset
+            routes[asset.hashed_path] = asset
+            if posixpath.basename(asset.url_path) == 'index.html':
+                routes[posixpath.dirname(asset.url_path).rstrip('/') + '/'] = asset
+
+        with self._lock:
+            self._assets = routes
+            self._signature = signature
+            self.stats['loads'] += 1
+        return len(assets)
+
+    def _rewrite_references(self, page, assets):
+        base = posixpath.dirname(page.url_path)
+
+        def replace(match):
+            url = match.group('url')
+            target = assets.get(posixpath.normpath(posixpath.join(base, url)))
+            if target is None or target.content_type == 'text/html':
+                return match.group(0)
+            return f"{match.group('attr')}{hashed_name(url, target.digest)}\""
+
+        return ASSET_REFERENCE.sub(replace, page.body.decode('utf-8')).encode('utf-8')
+
+    def _watch(self):
+        while True:
+            time.sleep(STATIC_RELOAD_INTERVAL)
+            try:
+                if self._scan() != self._signature:
+                    count = self.load()
+                    self.stats['reloads'] += 1
+                    print(f"Reloaded {count} static files")
+            except OSError as e:
+                # A file was replaced mid-scan; the next poll picks it up
+                print(f"Static reload failed: {e}")
+
+    def get(self, url_path):
+        with self._lock:
+            return self._assets.get(url_path)
@@ -0,0 +1,129 @@
+import os
+import numpy as np
+from core.personality import get_traits
+from core.snapshot import snapshot_store
+from core.ttl_cache import TTLCache
+
+TRAIT_INDEX_TTL = int(os.getenv('TRAIT_INDEX_TTL', 600))
+SEARCH_MAX_LIMIT = 100
+MISSING_VALUE = 'None'
+
+
+class TraitIndex:
+    """Inverted index over a collection's attributes with rarity scores.
+
+    Every (trait_type, value) pair gets a boolean posting list over token
+    rows, so a multi-trait filter is a handful of vectorized ANDs/ORs.
+    """
+
+    def __init__(self, nfts):
+        self.tokens = [
+            {
+                'token_id': str(nft.get('token_id')),
+                'name': nft.get('name'),
+                'image_url': nft.get('image_url'),
+                'attributes': get_traits(nft)
+            }
+            for nft in nfts
+        ]
+        self.size = len(self.tokens)
+
+        trait_maps = [{t.get('trait_type'): str(t.get('value')) for t in token['attributes']} for token in self.tokens]
+        self.trait_types = sorted({trait_type for trait_map in trait_maps for trait_type in trait_map if trait_type})
+
+        # codes[row, column] is the value id of that token's trait, 0 = missing/'None'
+        self.values = {}
+        codes = np.zeros((self.size, len(self.trait_types)), dtype=np.int32)
+        for column, trait_type in enumerate(self.trait_types):
+            values = [MISSING_VALUE]
+            value_ids = {MISSING_VALUE: 0}
+            for row, trait_map in enumerate(trait_maps):
+                value = trait_map.get(trait_type, MISSING_VALUE)
+                if value not in value_ids:
+                    value_ids[value] = len(values)
+                    values.append(value)
+                codes[row, column] = value_ids[value]
+            self.values[trait_type] = values
+        self.codes = codes
+
+        self.postings = {}
+        self.counts = {}
+        for column, trait_type in enumerate(self.trait_types):
+            counts = np.bincount(codes[:, column], minlength=len(self.values[trait_type]))
+            self.counts[trait_type] = counts
+            for value_id, value in enumerate(self.values[trait_type]):
+                self.postings[(trait_type, value)] = codes[:, column] == value_id
+
+        self.rarity_scores, self.rarity_ranks = self._score_rarity()
+        self.by_rarity = np.argsort(-self.rarity_scores, kind='stable')
+
+    def _score_rarity(self):
+        # Information content: sum over trait types of -log2(share of tokens
+        # sharing this token's value), with missing traits counted as a value.
+        if not self.size or not self.trait_types:
+            return np.zeros(self.size), np.ones(self.size, dtype=np.int32)
+        frequencies = np.empty(self.codes.shape, dtype=np.float64)
+        for column, trait_type in enumerate(self.trait_types):
+            frequencies[:, column] = self.counts[trait_type][self.codes[:, column]] / self.size
+        scores = -np.log2(frequencies).sum(axis=1)
+        order = np.argsort(-scores, kind='stable')
+        ranks = np.empty(self.size, dtype=np.int32)
+        ranks[order] = np.arange(1, self.size + 1)
+        return scores, ranks
+
+    def match(self, filters):
+        # filters: {trait_type: [values]} -> OR within a trait type, AND across types
+        mask = np.ones(self.size, dtype=bool)
+        for trait_type, values in filters.items():
+            type_mask = np.zeros(self.size, dtype=bool)
+            for value in values:
+                posting = self.postings.get((trait_type, value))
+                if posting is not None:
+                    type_mask |= posting
+            mask &= type_mask
+        return mask
+
+    def search(self, filters, sort='rarity', limit=20, offset=0):
+        mask = self.match(filters)
+        if sort == 'rarity':
+            rows = self.by_rarity[mask[self.by_rarity]]
+        else:
+            rows = np.flatnonzero(mask)
+        page = rows[offset:offset + limit]
+        return int(rows.size), [self.describe(row) for row in page]
+
+    def describe(self, row):
+        return dict(
+            self.tokens[row],
+            rarity_score=round(float(self.rarity_scores[row]), 4),
+            rarity_rank=int(self.rarity_ranks[row])
+        )
+
+
+
+def parse_trait_filters(trait_params):
+    # ["Hair Color:Blonde", "Tears:Yes", "Hair Color:Red"] -> {"Hair Color": ["Blonde", "Red"], "Tears": ["Yes"]}
+    filters = {}
+    for param in trait_params:
+        trait_type, sep, value = param.partition(':')
+        if not sep:
+            raise ValueError(f"Invalid trait filter '{param}', expected 'Trait Type:Value'")
+        filters.setdefault(trait_type.strip(), []).append(value.strip())
+    return filters
+
+
+trait_indexes = TTLCache('trait_index', ttl=TRAIT_INDEX_TTL, stale_ttl=TRAIT_INDEX_TTL, max_entries=16, max_bytes=None)
+
+
+def get_trait_index(chain, contract_address, fallback_nfts=None):
+    # Built from the snapshot once the collection is fully ingested; until
+    # then it only holds tokens fetched one by one, so use the caller's tokens
+    def build():
+        nfts = None
+        if snapshot_store.is_complete(chain, contract_address):
+            nfts = list(snapshot_store.iter_nfts(chain, contract_address))
+        if not nfts and fallback_nfts is not None:
+            nfts = fallback_nfts()
+        return TraitIndex(nfts) if nfts else None
+
+    return trait_indexes.get_or_load(f"{chain}_{contract_address.lower()}", build)
@@ -0,0 +1,282 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from core.cache_backends import BackendUnavailable
+from core.logs import get_logger
+from core.metrics import span
+from core.singleflight import SingleFlight
+
+log = get_logger('cache')
+
+# Shared by every cache; refreshes are cheap to queue and bounded in parallelism
+refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+
+
+def json_size(value):
+    return len(json.dumps(value, default=str))
+
+
+# Encoded copies kept per entry (one per distinct `fields=` projection, say)
+ENCODED_VARIANTS_PER_ENTRY = 8
+
+
+class CacheEntry:
+    __slots__ = ('value', 'size', 'expires_at', 'stale_until', 'encoded')
+
+    def __init__(self, value, size, expires_at, stale_until):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        # variant -> encoded value, dropped with the entry when it is replaced
+        self.encoded = {}
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTLs and stale-while-revalidate.
+
+    With a backend (core.cache_backends), entries are also written there and
+    in-process misses are looked up there before calling the loader.
+    """
+
+    def __init__(self, name, ttl, stale_ttl=0, max_entries=1024, max_bytes=None, sizeof=json_size, backend=None):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._refreshing = set()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.backend_errors = 0
+        self.evictions = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry, _ = self._lookup(key)
+        return entry.value if entry is not None else None
+
+    def peek(self, key):
+        # This process's copy, stale or not, without counting a lookup or touching the LRU order
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() >= entry.stale_until:
+                return None
+            return entry.value
+
+    def get_or_load(self, key, loader, ttl=None, refresh=None):
+        return self.get_or_load_state(key, loader, ttl, refresh)[0]
+
+    def get_or_load_state(self, key, loader, ttl=None, refresh=None):
+        # get_or_load, returning (value, stale). Fresh entries are returned as-is; expired entries inside the stale
+        # window are returned immediately while a background refresh runs.
+        # Only a true miss calls the loader on the request path, and concurrent
+        # misses for the same key wait on a single loader call. `refresh`, when
+        # given, replaces the loader for background refreshes.
+        with span('cache_lookup'):
+            entry, stale = self._lookup(key)
+        if entry is not None:
+            if stale:
+                self._schedule_refresh(key, refresh or loader, ttl)
+            return entry.value, stale
+
+        return self._flights.do(key, lambda: self._load(key, loader, ttl)), False
+
+    def get_or_load_encoded(self, key, loader, variant, encode, ttl=None, refresh=None):
+        # get_or_load, then encode(value) memoized on the entry under `variant`,
+        # so repeat hits skip serialization. A refresh replaces the entry and
+        # with it every encoded copy. Encoded values must support len().
+        with span('cache_lookup'):
+            entry, stale = self._lookup(key)
+        if entry is not None:
+            if stale:
+                self._schedule_refresh(key, refresh or loader, ttl)
+            encoded = entry.encoded.get(variant)
+            if encoded is not None:
+                return encoded
+            value = entry.value
+        else:
+            value = self._flights.do(key, lambda: self._load(key, loader, ttl))
+            if value is None:
+                return None
+
+        encoded = encode(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Only memoize onto the entry the value came from
+            if entry is not None and entry.value is value and len(entry.encoded) < ENCODED_VARIANTS_PER_ENTRY:
+                if variant not in entry.encoded:
+                    entry.encoded[variant] = encoded
+                    if self.max_bytes:
+                        entry.size += len(encoded)
+                        self._bytes += len(encoded)
+                        self._evict()
+        return encoded
+
+    def _load(self, key, loader, ttl):
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        entry = self._entry(value, now + ttl, now + ttl + self.stale_ttl)
+        with self._lock:
+            self._install(key, entry)
+        self._backend_call('set', key, value, entry.expires_at, entry.stale_until)
+
+    def _entry(self, value, expires_at, stale_until):
+        size = self.sizeof(value) if self.max_bytes else 0
+        return CacheEntry(value, size, expires_at, stale_until)
+
+    def _install(self, key, entry):
+        # Caller holds the lock
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.size
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self._evict()
+
+    def _backend_call(self, method, key, *args):
+        # A failing backend degrades to a per-process cache rather than failing requests
+        if self.backend is None:
+            return None
+        try:
+            return getattr(self.backend, method)(f"{self.name}:{key}", *args)
+        except Exception as e:
+            with self._lock:
+                self.backend_errors += 1
+            if isinstance(e, BackendUnavailable):
+                return None  # already logged when it went down
+            log.warning("Shared cache backend failed", extra={
+                'cache': self.name, 'backend': self.backend.name, 'op': method, 'error': str(e)
+            })
+            return None
+
+    def _shared_entry(self, key, now):
+        found = self._backend_call('get', key)
+        if found is None:
+            return None
+        value, expires_at, stale_until = found
+        if now >= stale_until:
+            return None
+        return self._entry(value, expires_at, stale_until)
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry.size
+        self._backend_call('delete', key)
+
+    def clear(self):
+        # Only this process's copies; the shared backend keeps its entries
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.shared_hits + self.misses
+            flights = self._flights.stats()
+            return {
+                'backend': self.backend.name if self.backend is not None else 'memory',
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'backend_errors': self.backend_errors,
+                'evictions': self.evictions,
+                'refreshes': self.refreshes,
+                'refresh_errors': self.refresh_errors,
+                'coalesced_loads': flights['coalesced'],
+                'hit_ratio': round((self.hits + self.stale_hits + self.shared_hits) / lookups, 4) if lookups else 0.0
+            }
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry.stale_until:
+                del self._entries[key]
+                self._bytes -= entry.size
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now >= entry.expires_at:
+                    self.stale_hits += 1
+                    return entry, True
+                self.hits += 1
+                return entry, False
+            if self.backend is None:
+                self.misses += 1
+                return None, False
+
+        # Another worker may already have loaded it
+        entry = self._shared_entry(key, now)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self.shared_hits += 1
+            self._install(key, entry)
+        return entry, now >= entry.expires_at
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def _schedule_refresh(self, key, loader, ttl):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        refresh_pool.submit(self._refresh, key, loader, ttl)
+
+    def _refresh(self, key, loader, ttl):
+        try:
+            # Skip upstream if another worker has refreshed it already
+            now = time.time()
+            entry = self._shared_entry(key, now) if self.backend is not None else None
+            if entry is not None and now < entry.expires_at:
+                with self._lock:
+                    self._install(key, entry)
+                    self.refreshes += 1
+                return
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            # Keep serving the stale value; the next stale hit retries
+            log.warning("Error refreshing cache entry", extra={'cache': self.name, 'key': key, 'error': str(e)})
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
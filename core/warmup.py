@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from core.concurrency import Overloaded
+from core.personality import (
+    PERSONALITY_MODEL, generate_personality, get_traits, normalize_traits, personality_cache_key
+)
+from core.personality_cache import PERSONALITY_SNAPSHOT_PATH, PersonalityCache, personality_cache
+from core.snapshot import snapshot_store
+
+# Precomputes personalities for a whole collection so no visitor waits on
+# Claude. The output file doubles as the checkpoint: a rerun skips tokens it
+# already lists, and server.py / api/vercel_handler.py load it at startup.
+
+
+def load_checkpoint(path, model):
+    if not os.path.exists(path):
+        return {'model': model, 'personalities': {}, 'tokens': {}}
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('model') != model:
+        raise SystemExit(f"{path} was generated with {checkpoint.get('model')}, not {model}")
+    return checkpoint
+
+
+def write_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f, separators=(',', ':'), sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def iter_collection(client, store, chain, contract_address):
+    # Prefer a fully ingested snapshot; otherwise page SimpleHash directly
+    if store.is_complete(chain, contract_address):
+        yield from store.iter_nfts(chain, contract_address)
+        return
+    for nfts, _ in client.iter_collection_pages(chain, contract_address):
+        yield from nfts
+
+
+def warm_collection(claude, nfts, output_path, model=PERSONALITY_MODEL, concurrency=4, checkpoint_every=25,
+                    cache=personality_cache):
+    checkpoint = load_checkpoint(output_path, model)
+    cache.load_snapshot(output_path)
+    lock = threading.Lock()
+    summary = {'generated': 0, 'skipped': 0, 'failed': 0}
+
+    def warm(nft_data):
+        token_id = str(nft_data.get('token_id'))
+        cache_key = personality_cache_key(normalize_traits(get_traits(nft_data)), model)
+        try:
+            generate_personality(claude, nft_data, model=model, cache=cache)
+        except Overloaded:
+            pass  # counted as failed below and retried on the next run
+        # Fallback personalities are never cached, so a miss here means the call failed
+        personality = cache.get(cache_key)
+        with lock:
+            if personality is None:
+                summary['failed'] += 1
+                return
+            checkpoint['personalities'][cache_key] = personality
+            checkpoint['tokens'][token_id] = cache_key
+            summary['generated'] += 1
+            if summary['generated'] % checkpoint_every == 0:
+                write_checkpoint(output_path, checkpoint)
+                print(f"Checkpoint: {len(checkpoint['tokens'])} tokens warmed")
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='warmup') as pool:
+        futures = []
+        for nft_data in nfts:
+            if str(nft_data.get('token_id')) in checkpoint['tokens']:
+                summary['skipped'] += 1
+                continue
+            futures.append(pool.submit(warm, nft_data))
+        for future in as_completed(futures):
+            future.result()
+
+    write_checkpoint(output_path, checkpoint)
+    summary['tokens'] = len(checkpoint['tokens'])
+    summary['personalities'] = len(checkpoint['personalities'])
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute personalities for every token in a collection")
+    parser.add_argument('chain')
+    parser.add_argument('contract')
+    parser.add_argument('--output', help=f"snapshot/checkpoint file (default {PERSONALITY_SNAPSHOT_PATH})")
+    parser.add_argument('--model', default=PERSONALITY_MODEL)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--checkpoint-every', type=int, default=25)
+    parser.add_argument('--fake-llm', action='store_true', help="use a deterministic local stand-in instead of Claude")
+    parser.add_argument('--fake-latency', type=float, default=0.0, help="seconds per fake LLM call")
+    args = parser.parse_args()
+
+    cache = personality_cache
+    output = args.output or PERSONALITY_SNAPSHOT_PATH
+    if args.fake_llm:
+        from core.fakes import FakeClaude
+        claude = FakeClaude(latency=args.fake_latency)
+        # Keep fake text out of the real cache and the shipped snapshot
+        cache = PersonalityCache(':memory:')
+        output = args.output or os.path.join(os.path.dirname(PERSONALITY_SNAPSHOT_PATH), 'personalities.fake.json')
+    else:
+        from core.clients import get_claude
+        claude = get_claude()
+
+    from core.simplehash import SimpleHashClient
+    client = SimpleHashClient(os.getenv('SIMPLEHASH_API_KEY'))
+
+    started = time.time()
+    summary = warm_collection(
+        claude,
+        iter_collection(client, snapshot_store, args.chain, args.contract),
+        output,
+        model=args.model,
+        concurrency=args.concurrency,
+        checkpoint_every=args.checkpoint_every,
+        cache=cache
+    )
+    summary['seconds'] = round(time.time() - started, 2)
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,39 @@
+from core.startup import mark_response, timed
 import http.server
-import socketserver
 import mimetypes
-import json
-import anthropic
 import os
-import requests
-from urllib.parse import parse_qs, urlparse
-
-PORT = 8000
+import signal
+import subprocess
+import sys
+import time
+with timed('import core.app'):
+    from core.app import Api, route_name
+from core.http_cache import IMMUTABLE, cache_control_for, etag_matches, negotiate_encoding
+from core.images import IMAGE_PROXY_SECRET
+from core.static import StaticAssets
+from core.caches import shared_backend
+from core.concurrency import SERVER_IDLE_TIMEOUT, SERVER_PROCESSES, SERVER_WORKERS, ThreadPoolHTTPServer
+from core.logs import configure_logging, get_logger
+from core.metrics import request_seconds, span
+
+PORT = int(os.getenv('PORT', 8000))
 DIRECTORY = "src"
 SIMPLEHASH_API_KEY = os.getenv('SIMPLEHASH_API_KEY', "ondora_sk_m2mol2kuwo4c1u7u6c3ax9ul1sxgkmtm")
 
-# Supported chains from SimpleHash
-SUPPORTED_CHAINS = [
-    "ethereum", "polygon", "solana", "bitcoin", "arbitrum", "optimism", 
-    "base", "avalanche", "bsc", "zora", "blast", "mantle"
-]
-
 print(f"\nUsing SimpleHash API key: {SIMPLEHASH_API_KEY}")
 
-# Initialize Claude client
-claude = anthropic.Client(api_key=os.getenv('ANTHROPIC_API_KEY'))
+# Routes shared with api/vercel_handler.py; upstream clients are built on first use
+api = Api(SIMPLEHASH_API_KEY)
+access_log = get_logger('access')
+
+# src/ read, hashed and precompressed once; reloads on change with STATIC_RELOAD=1
+with timed('load static assets'):
+    static_assets = StaticAssets(DIRECTORY)
 
 class NFTRequestHandler(http.server.SimpleHTTPRequestHandler):
-    nft_cache = {}  # Initialize the cache as a class variable
-    collection_cache = {}  # Cache for collection metadata
-    
+    # Socket timeout for every read and write, so an idle connection can't hold a worker forever
+    timeout = SERVER_IDLE_TIMEOUT
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=DIRECTORY, **kwargs)
 
@@ -33,277 +41,132 @@ class NFTRequestHandler(http.server.SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
         super().end_headers()
+        mark_response()
+
+    def handle_one_request(self):
+        started = time.perf_counter()
+        self.status = None
+        super().handle_one_request()
+        if self.status is not None:
+            request_seconds.observe(time.perf_counter() - started, route_name(self.path), self.command, self.status)
+
+    def log_request(self, code='-', size='-'):
+        # Queued for the log thread instead of a blocking stderr write per request
+        self.status = int(code) if str(code).isdigit() else code
+        access_log.info("%s %s %s", self.command, self.path, self.status, extra={'client': self.client_address[0]})
+
+    def log_message(self, format, *args):
+        access_log.warning(format, *args, extra={'client': self.client_address[0]})
+
+    def log_error(self, format, *args):
+        if format.startswith('Request timed out'):
+            # Browser preconnects end this way all the time
+            access_log.info("Idle connection closed", extra={'client': self.client_address[0]})
+            return
+        self.log_message(format, *args)
 
     def do_OPTIONS(self):
         self.send_response(200)
         self.end_headers()
 
-    def fetch_collection_metadata(self, chain, contract_address):
-        cache_key = f"{chain}_{contract_address}"
-        if cache_key in self.collection_cache:
-            return self.collection_cache[cache_key]
-
-        url = f"https://api.simplehash.com/api/v0/nfts/{chain}/{contract_address}"
-        headers = {
-            "accept": "application/json",
-            "X-API-KEY": SIMPLEHASH_API_KEY
-        }
-        params = {
-            "limit": 12,
-            "order_by": "token_id"
-        }
-
-        try:
-            response = requests.get(url, headers=headers, params=params)
-            if response.ok:
-                data = response.json()
-                
-                # Extract collection metadata
-                if data.get('nfts') and len(data['nfts']) > 0:
-                    collection_data = data['nfts'][0].get('collection', {})
-                    collection_info = {
-                        'collection_id': collection_data.get('collection_id'),
-                        'name': collection_data.get('name'),
-                        'description': collection_data.get('description'),
-                        'image_url': collection_data.get('image_url'),
-                        'banner_image_url': collection_data.get('banner_image_url'),
-                        'category': collection_data.get('category'),
-                        'external_url': collection_data.get('external_url'),
-                        'twitter_username': collection_data.get('twitter_username'),
-                        'discord_url': collection_data.get('discord_url'),
-                        'floor_prices': collection_data.get('floor_prices', []),
-                        'distinct_owner_count': collection_data.get('distinct_owner_count'),
-                        'distinct_nft_count': collection_data.get('distinct_nft_count'),
-                        'total_quantity': collection_data.get('total_quantity'),
-                        'nfts': data['nfts']
-                    }
-                    self.collection_cache[cache_key] = collection_info
-                    return collection_info
-            return None
-        except Exception as e:
-            print(f"Error fetching collection metadata: {e}")
-            return None
-
-    def fetch_nft_metadata(self, chain, contract_address, token_id):
-        cache_key = f"{chain}_{contract_address}_{token_id}"
-        if cache_key in self.nft_cache:
-            return self.nft_cache[cache_key]
-
-        url = f"https://api.simplehash.com/api/v0/nfts/{chain}/{contract_address}/{token_id}"
-        headers = {
-            "accept": "application/json",
-            "X-API-KEY": SIMPLEHASH_API_KEY
-        }
-
-        try:
-            response = requests.get(url, headers=headers)
-            if response.ok:
-                data = response.json()
-                self.nft_cache[cache_key] = data
-                return data
-            return None
-        except Exception as e:
-            print(f"Error fetching NFT metadata: {e}")
-            return None
-
-    def generate_personality(self, nft_data):
-        traits = nft_data.get('extra_metadata', {}).get('attributes', [])
-        trait_map = {t['trait_type']: t['value'] for t in traits}
-        
-        # Build a detailed trait description
-        trait_desc = []
-        for trait in traits:
-            if trait['value'] != 'None':
-                trait_desc.append(f"{trait['trait_type']}: {trait['value']}")
-        
-        trait_text = '\n'.join(trait_desc)
-        
-        personality_prompt = f"""You are generating a personality for Boy #{nft_data.get('token_id')} from the Boys collection.
-This NFT has the following specific traits:
-{trait_text}
-
-Create a personality description that EXACTLY matches these traits.
-Rules:
-1. ONLY mention traits that are listed above
-2. Use the EXACT values for each trait (e.g., if Hair Color is 'Blonde', don't say 'golden' or 'yellow')
-3. If a trait is not listed or is 'None', do not mention it at all
-4. Focus on the unique combination of:
-   - Hair Color: {trait_map.get('Hair Color', 'None')}
-   - Face Add-ons: {trait_map.get('Face Add-ons', 'None')}
-   - Eyes: {trait_map.get('Eyes', 'None')}
-   - Clothing: {trait_map.get('Clothing', 'None')}
-   - Tears: {trait_map.get('Tears', 'None')}
-
-The description should be 2-3 sentences long and maintain a warm, artistic tone while being 100% accurate to the traits."""
-
-        try:
-            message = claude.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=150,
-                temperature=0.7,
-                messages=[{
-                    "role": "user",
-                    "content": personality_prompt
-                }]
-            )
-            
-            # Validate the generated personality against actual traits
-            personality = message.content[0].text
-            print(f"\nGenerated personality for Boy #{nft_data.get('token_id')}:")
-            print(f"Traits: {trait_text}")
-            print(f"Personality: {personality}")
-            return personality
-            
-        except Exception as e:
-            print(f"Error generating personality: {e}")
-            return "A unique character with a gentle soul and artistic spirit."
-
     def do_GET(self):
-        parsed_url = urlparse(self.path)
-        
-        # Return list of supported chains
-        if parsed_url.path == '/api/chains':
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({'chains': SUPPORTED_CHAINS}).encode())
+        if self.path.startswith('/api/'):
+            self.handle_api('GET')
             return
-
-        # Fetch collection metadata
-        if parsed_url.path == '/api/collection':
-            query_params = parse_qs(parsed_url.query)
-            chain = query_params.get('chain', [None])[0]
-            contract_address = query_params.get('contract', [None])[0]
-            
-            if not chain or not contract_address:
-                self.send_error(400, "Missing chain or contract address")
-                return
-                
-            collection_data = self.fetch_collection_metadata(chain, contract_address)
-            if collection_data:
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(collection_data).encode())
-            else:
-                self.send_error(404, "Collection not found")
+        if self.send_static('GET'):
             return
+        return super().do_GET()
 
-        # Fetch specific NFT metadata
-        if parsed_url.path.startswith('/api/nft/'):
-            query_params = parse_qs(parsed_url.query)
-            chain = query_params.get('chain', [None])[0]
-            contract_address = query_params.get('contract', [None])[0]
-            token_id = parsed_url.path.split('/')[-1]
-            
-            if not chain or not contract_address:
-                self.send_error(400, "Missing chain or contract address")
-                return
-                
-            nft_data = self.fetch_nft_metadata(chain, contract_address, token_id)
-            if nft_data:
-                personality = self.generate_personality(nft_data)
-                nft_data['generated_personality'] = personality
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(nft_data).encode())
-            else:
-                self.send_error(404, "NFT not found")
+    def do_HEAD(self):
+        if self.path.startswith('/api/'):
+            self.handle_api('HEAD')
             return
-
-        return super().do_GET()
+        if self.send_static('HEAD'):
+            return
+        return super().do_HEAD()
 
     def do_POST(self):
-        if self.path == '/api/chat':
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            request_data = json.loads(post_data.decode('utf-8'))
-
-            user_input = request_data.get('userInput', '')
-            language = request_data.get('language', 'en-US')
-            nft_id = request_data.get('nft_id', '')
-
-            try:
-                # Get NFT metadata if nft_id is provided
-                nft_context = ""
-                if nft_id:
-                    nft_data = self.fetch_nft_metadata(nft_id)
-                    if nft_data:
-                        traits = nft_data.get('extra_metadata', {}).get('attributes', [])
-                        trait_map = {t['trait_type']: t['value'] for t in traits}
-                        
-                        # Create a more natural personality description
-                        personality_traits = []
-                        if trait_map.get('Hair Color'):
-                            personality_traits.append(f"You have {trait_map['Hair Color'].lower()} hair")
-                        if trait_map.get('Eyes') and trait_map['Eyes'] != 'Regular':
-                            personality_traits.append(f"{trait_map['Eyes'].lower()} eyes")
-                        if trait_map.get('Clothing'):
-                            personality_traits.append(f"wearing a {trait_map['Clothing'].lower()}")
-                        if trait_map.get('Face Add-ons') != 'None':
-                            personality_traits.append(f"with {trait_map['Face Add-ons'].lower()}")
-                        if trait_map.get('Tears') == 'Yes':
-                            personality_traits.append("and you're feeling emotional right now")
-                        
-                        traits_desc = ', '.join(personality_traits)
-                        
-                        system_prompt = f"""You are Boy #{nft_id}, a gentle and artistic soul who loves connecting with people. {traits_desc}.
-You have a warm, friendly personality and enjoy thoughtful conversations about art, emotions, and life.
-Keep your responses natural and conversational, as if chatting with a friend.
-Avoid mentioning that you're an NFT or part of a collection - just be yourself.
-When speaking, keep responses concise (2-3 sentences) and maintain a warm, genuine tone."""
-
-                # Prepare the message for Claude
-                if language == 'es-ES':
-                    system_prompt += "\nPlease respond in Spanish, maintaining the same warm and natural tone."
-                
-                print(f"\nProcessing request:")
-                print(f"User input: {user_input}")
-                print(f"Language: {language}")
-                print(f"System prompt: {system_prompt}")
-                
-                # Get response from Claude
-                message = claude.messages.create(
-                    model="claude-3-sonnet-20240307",
-                    max_tokens=150,
-                    temperature=0.7,
-                    system=system_prompt,
-                    messages=[{
-                        "role": "user",
-                        "content": user_input
-                    }]
-                )
+        if self.path.startswith('/api/'):
+            content_length = int(self.headers.get('Content-Length') or 0)
+            self.handle_api('POST', self.rfile.read(content_length))
+            return
+        return super().do_POST()
 
-                response_text = message.content[0].text
-                print(f"Claude response: {response_text}")
+    def request_headers(self):
+        return {name.lower(): value for name, value in self.headers.items()}
+
+    def handle_api(self, method, body=b''):
+        response = api.handle(method, self.path, self.request_headers(), body, client=self.client_address[0])
+        self.send_response_object(method, response)
+
+    def send_static(self, method):
+        # Directories without an index and unknown paths fall through to the stock handler
+        url_path = self.path.split('?', 1)[0].split('#', 1)[0]
+        asset = static_assets.get(url_path)
+        if asset is None:
+            return False
+
+        encoding = None
+        if asset.variants:
+            encoding = negotiate_encoding(self.headers.get('Accept-Encoding'))
+            if encoding not in asset.variants:
+                encoding = None
+        etag = asset.etag(encoding)
+        immutable = url_path == asset.hashed_path and url_path != asset.url_path
+
+        not_modified = etag_matches(self.headers.get('If-None-Match'), etag)
+        self.send_response(304 if not_modified else 200)
+        self.send_header('Cache-Control', IMMUTABLE if immutable else cache_control_for(url_path))
+        self.send_header('ETag', etag)
+        if asset.variants:
+            self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
+            self.end_headers()
+            return True
 
-                response_data = {
-                    'response': response_text
-                }
-                
-                self.send_response(200)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps(response_data).encode())
-            
-            except Exception as e:
-                print(f"\nError in API call:")
-                print(f"Type: {type(e).__name__}")
-                print(f"Message: {str(e)}")
-                self.send_response(500)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                error_response = {
-                    'error': str(e),
-                    'type': type(e).__name__
-                }
-                self.wfile.write(json.dumps(error_response).encode())
+        body = asset.variants[encoding] if encoding else asset.body
+        self.send_header('Content-Type', asset.content_type)
+        self.send_header('Content-Length', str(len(body) if body is not None else asset.size))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if method == 'HEAD':
+            return True
+        if body is not None:
+            with span('write'):
+                self.wfile.write(body)
+            return True
+        try:
+            # Zero-copy from the page cache to the socket
+            with open(asset.file_path, 'rb') as f, span('write'):
+                self.connection.sendfile(f, count=asset.size)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        return True
+
+    def send_response_object(self, method, response):
+        self.send_response(response.status)
+        for name, value in response.headers.items():
+            self.send_header(name, value)
+        if response.stream is None:
+            if response.status != 304:
+                self.send_header('Content-Length', str(len(response.body)))
+            self.end_headers()
+            if method != 'HEAD':
+                with span('write'):
+                    self.wfile.write(response.body)
             return
 
-        return super().do_POST()
+        self.end_headers()
+        try:
+            for chunk in response.stream:
+                self.wfile.write(chunk)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            access_log.info("Client disconnected during streamed response", extra={'path': self.path})
+        finally:
+            response.stream.close()
 
     def guess_type(self, path):
         mimetype = mimetypes.guess_type(path)[0]
@@ -311,12 +174,49 @@ When speaking, keep responses concise (2-3 sentences) and maintain a warm, genui
             mimetype = 'application/octet-stream'
         return mimetype
 
-try:
-    with socketserver.TCPServer(("", PORT), NFTRequestHandler) as httpd:
-        print(f"\nServer running at http://localhost:{PORT}")
-        print(f"Using Anthropic API key: {os.getenv('ANTHROPIC_API_KEY')[:10]}...")
+def run_processes():
+    # Supervisor: starts SERVER_PROCESSES copies of this server on one port
+    print(f"\nStarting {SERVER_PROCESSES} server processes on port {PORT}")
+    if shared_backend is None:
+        print("CACHE_BACKEND=memory: each process warms its own metadata cache")
+    # Turn SIGTERM into SystemExit so the workers are stopped with us
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    children = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=dict(os.environ, SERVER_PROCESS_INDEX=str(i)))
+        for i in range(SERVER_PROCESSES)
+    ]
+    try:
+        for child in children:
+            child.wait()
+    except KeyboardInterrupt:
+        print("\nServer stopped by user")
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait()
+
+def run():
+    if SERVER_PROCESSES > 1 and 'SERVER_PROCESS_INDEX' not in os.environ:
+        if not (IMAGE_PROXY_SECRET or SIMPLEHASH_API_KEY):
+            # Each process would sign image URLs with its own random key
+            sys.exit("SERVER_PROCESSES > 1 needs IMAGE_PROXY_SECRET or SIMPLEHASH_API_KEY")
+        run_processes()
+        return
+    configure_logging()
+    preloaded = api.load_personalities()
+    if preloaded:
+        print(f"\nLoaded {preloaded} precomputed personalities")
+    httpd = ThreadPoolHTTPServer(("", PORT), NFTRequestHandler, reuse_port=SERVER_PROCESSES > 1)
+    try:
+        print(f"\nServer running at http://localhost:{PORT} ({SERVER_WORKERS} workers)")
+        print(f"Using Anthropic API key: {(os.getenv('ANTHROPIC_API_KEY') or '')[:10]}...")
         print("Ready to process requests!")
         httpd.serve_forever()
-except KeyboardInterrupt:
-    print("\nServer stopped by user")
-    httpd.server_close() 
\ No newline at end of file
+    except KeyboardInterrupt:
+        print("\nServer stopped by user")
+    finally:
+        httpd.server_close()
+
+if __name__ == '__main__':
+    run()
@@ -3,6 +3,7 @@ class NFTVoiceChat {
         this.currentLanguage = 'en-US';
         this.isRecording = false;
         this.currentNFT = null;
+        this.chatSessionId = null;
         this.selectedChain = '';
         this.selectedContract = '';
         
@@ -156,7 +157,7 @@ class NFTVoiceChat {
 
     async loadNFTMetadata(tokenId) {
         try {
-            const response = await fetch(`/api/nft/${tokenId}?chain=${this.selectedChain}&contract=${this.selectedContract}`);
+            const response = await fetch(`/api/nft/${tokenId}?chain=${this.selectedChain}&contract=${this.selectedContract}&language=${encodeURIComponent(this.currentLanguage)}`);
             const data = await response.json();
             
             // Update NFT display
@@ -182,6 +183,7 @@ class NFTVoiceChat {
             }
             
             this.currentNFT = data;
+            this.chatSessionId = null;  // New Boy, new conversation
         } catch (error) {
             console.error('Error loading NFT metadata:', error);
             alert('Error loading NFT metadata. Please try again.');
@@ -294,32 +296,73 @@ class NFTVoiceChat {
             const response = await fetch('/api/chat', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
                 },
                 body: JSON.stringify({
                     userInput: text,
                     language: this.currentLanguage,
-                    nft_id: this.currentNFT.token_id
+                    nft_id: this.currentNFT.token_id,
+                    chain: this.chainSelect.value,
+                    contract: this.contractInput.value,
+                    session_id: this.chatSessionId,
+                    stream: true
                 })
             });
+            if (!response.ok || !response.body) throw new Error('Chat request failed');
             
-            const data = await response.json();
-            if (data.response) {
-                this.addMessageToChat('nft', data.response);
-                this.speakResponse(data.response);
-            }
+            // Speak each sentence as soon as it arrives instead of waiting for the full reply
+            const messageDiv = this.addMessageToChat('nft', '');
+            await this.readEventStream(response, (event, data) => {
+                if (event === 'sentence') {
+                    messageDiv.textContent = messageDiv.textContent ? `${messageDiv.textContent} ${data.text}` : data.text;
+                    this.chatBox.scrollTop = this.chatBox.scrollHeight;
+                    this.speakResponse(data.text);
+                } else if (event === 'done') {
+                    this.chatSessionId = data.session_id;
+                } else if (event === 'error') {
+                    throw new Error(data.error);
+                }
+            });
         } catch (error) {
             console.error('Error sending message:', error);
             this.addMessageToChat('system', 'Error processing your message. Please try again.');
         }
     }
 
+    async readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                rawEvent.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+
     addMessageToChat(sender, text) {
         const messageDiv = document.createElement('div');
         messageDiv.className = `message ${sender}-message`;
         messageDiv.textContent = text;
         this.chatBox.appendChild(messageDiv);
         this.chatBox.scrollTop = this.chatBox.scrollHeight;
+        return messageDiv;
     }
 
     speakResponse(text) {